@@ -6,10 +6,75 @@ function [masses, t, sol, W] = get_simulation_results(initial_params)
     gravity on;
     
     [model, schedule, initState, dh] = setup_model(initial_params);
-    [~, states] = simulateScheduleAD(initState, model, schedule);
+    opt.trapstruct = get_trap_analysis(model.G, initial_params.formation, initial_params.grid_coarsening);
 
-    opt.trapstruct = trapAnalysis(model.G, false);
+    % The injection phase only depends on the well and the injection
+    % settings, so runs that differ in migration reuse its saved states
+    inj_steps = initial_params.inj_steps;
+    inj_file  = '';
+    if isfield(initial_params, 'injection_key') && ~isempty(initial_params.injection_key) && inj_steps > 0
+        inj_file = injection_cache_file(initial_params.injection_key);
+    end
+
+    % With a progress_file, the inventory of every finished step is
+    % appended to it while the simulation runs
+    progress_file = '';
+    if isfield(initial_params, 'progress_file')
+        progress_file = initial_params.progress_file;
+    end
+
+    if ~isempty(inj_file) && exist(inj_file, 'file')
+        inj = load(inj_file);
+        mig_schedule = schedule;
+        mig_schedule.step.val     = schedule.step.val(inj_steps + 1:end);
+        mig_schedule.step.control = schedule.step.control(inj_steps + 1:end);
+        [~, mig_states] = simulateScheduleAD(inj.states{end}, model, mig_schedule, ...
+            'afterStepFn', after_step_fn(inj.states));
+        states = [inj.states; mig_states];
+    else
+        [~, states] = simulateScheduleAD(initState, model, schedule, 'afterStepFn', after_step_fn({}));
+    end
+
+    % A stopped simulation leaves the remaining steps empty; report on
+    % the steps that were computed
+    states = states(~cellfun(@isempty, states));
+    if ~isempty(inj_file) && ~exist(inj_file, 'file') && numel(states) >= inj_steps
+        save_injection_states(inj_file, states(1:inj_steps));
+    end
+    schedule.step.val     = schedule.step.val(1:numel(states));
+    schedule.step.control = schedule.step.control(1:numel(states));
 
     [masses, t, sol, W] = makeReports(model.G, [{initState}; states], model.rock, ...
         model.fluid, schedule, [model.fluid.res_water, ...
-        model.fluid.res_gas], opt.trapstruct, dh);
\ No newline at end of file
+        model.fluid.res_gas], opt.trapstruct, dh);
+
+    function fn = after_step_fn(prefix_states)
+        fn = [];
+        if ~isempty(progress_file)
+            fn = stream_inventory(progress_file, model, initState, prefix_states, schedule, opt.trapstruct, dh);
+        end
+    end
+end
+
+% ----------------------------------------------------------------------------
+
+function save_injection_states(inj_file, states)
+    inj_dir = fileparts(inj_file);
+    if ~exist(inj_dir, 'dir')
+        mkdir(inj_dir);
+    end
+    % Written aside and renamed, so a run killed mid-save never leaves a truncated file behind
+    tmp_file = sprintf('%s.%d.tmp', inj_file, getpid());
+    save('-v7', tmp_file, 'states');
+    rename(tmp_file, inj_file);
+end
+
+% ----------------------------------------------------------------------------
+
+function inj_file = injection_cache_file(key)
+    root = getenv('CO2SIM_CACHE_DIR');
+    if isempty(root)
+        root = fullfile(tempdir, 'co2sim');
+    end
+    inj_file = fullfile(root, 'injection', [key, '.mat']);
+end
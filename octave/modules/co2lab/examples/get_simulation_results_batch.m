@@ -0,0 +1,38 @@
+function [masses, t] = get_simulation_results_batch(initial_params, well_positions, well_cells, injection_keys)
+% Runs one simulation per row of well_positions against the same cached
+% model setup and returns the inventories stacked as a numeric array of
+% size (number of wells) x (number of steps) x (number of inventory fields).
+% well_cells, if given and non-empty, holds the 0-based cells resolved on
+% the Python side, one per well. injection_keys, if given, names the saved
+% injection phase of each well (see get_simulation_results).
+
+   if nargin < 3
+      well_cells = [];
+   end
+   if nargin < 4
+      injection_keys = {};
+   end
+
+   n_wells = size(well_positions, 1);
+   masses  = [];
+
+   for i = 1:n_wells
+      params = initial_params;
+      params.well_position = num2cell(well_positions(i, :));
+      if ~isempty(well_cells)
+         params.well_cell = well_cells(i);
+      end
+      if ~isempty(injection_keys)
+         params.injection_key = injection_keys{i};
+      end
+
+      [well_masses, well_t] = get_simulation_results(params);
+      well_masses = cell2mat(well_masses(:));
+
+      if isempty(masses)
+         masses = zeros([n_wells, size(well_masses)]);
+         t      = cell2mat(well_t);
+      end
+      masses(i, :, :) = well_masses;
+   end
+end
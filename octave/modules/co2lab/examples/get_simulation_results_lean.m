@@ -0,0 +1,19 @@
+function [masses, t, fields] = get_simulation_results_lean(initial_params, cell_fields)
+% Same simulation as get_simulation_results, but only plain matrices go
+% back to the caller: the inventory as (number of steps) x (number of
+% inventory fields), the report times, and, on request, the named
+% per-cell fields of the final state (e.g. 's', 'h', 'h_max') as single.
+
+   if nargin < 2
+      cell_fields = {};
+   end
+
+   [masses, t, sol] = get_simulation_results(initial_params);
+   masses = cell2mat(masses(:));
+   t      = cell2mat(t);
+
+   fields = struct();
+   for i = 1:numel(cell_fields)
+      fields.(cell_fields{i}) = single(sol{end}.(cell_fields{i}));
+   end
+end
@@ -0,0 +1,45 @@
+function ts = get_trap_analysis(Gt, formation, coarsening)
+% Trap analysis of a formation top surface. The result only depends on the
+% grid, so it is kept in memory for the session and saved to
+% $CO2SIM_CACHE_DIR/traps (default: <tempdir>/co2sim/traps) for later ones.
+
+   persistent keys values
+
+   if isempty(keys)
+      keys = {}; values = {};
+   end
+
+   key = sprintf('%s_%d', lower(formation), coarsening);
+   ix = find(strcmp(keys, key), 1);
+   if ~isempty(ix)
+      ts = values{ix};
+      return;
+   end
+
+   cache_file = fullfile(trap_cache_dir(), ['trapAnalysis_', key, '.mat']);
+   if exist(cache_file, 'file')
+      ts = load(cache_file);
+      ts = ts.ts;
+   else
+      ts = trapAnalysis(Gt, false);
+      if ~exist(trap_cache_dir(), 'dir')
+         mkdir(trap_cache_dir());
+      end
+      tmp_file = sprintf('%s.%d.tmp', cache_file, getpid());
+      save('-v7', tmp_file, 'ts');
+      rename(tmp_file, cache_file);
+   end
+
+   keys{end+1} = key;
+   values{end+1} = ts;
+end
+
+% ----------------------------------------------------------------------------
+
+function cache_dir = trap_cache_dir()
+   root = getenv('CO2SIM_CACHE_DIR');
+   if isempty(root)
+      root = fullfile(tempdir, 'co2sim');
+   end
+   cache_dir = fullfile(root, 'traps');
+end
@@ -0,0 +1,15 @@
+function edges = get_trap_boundaries(formation, coarsening)
+% Node pairs (1-based) of the grid faces separating a trap from its
+% surroundings, for drawing trap outlines.
+
+   Gt = [];
+   load(['Gt_', lower(formation), '.mat']);
+   ts = get_trap_analysis(Gt, formation, coarsening);
+
+   N = Gt.faces.neighbors;
+   trap = zeros(size(N));
+   trap(N > 0) = ts.traps(N(N > 0));
+
+   f = find(trap(:, 1) ~= trap(:, 2));
+   edges = [Gt.faces.nodes(Gt.faces.nodePos(f)), Gt.faces.nodes(Gt.faces.nodePos(f) + 1)];
+end
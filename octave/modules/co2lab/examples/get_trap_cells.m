@@ -0,0 +1,9 @@
+function traps = get_trap_cells(formation, coarsening)
+% Trap index of every grid cell (0 for cells outside any structural trap).
+
+   Gt = [];
+   load(['Gt_', lower(formation), '.mat']);
+   ts = get_trap_analysis(Gt, formation, coarsening);
+
+   traps = ts.traps;
+end
@@ -6,6 +6,17 @@ function [model, schedule, initState, dh] = setup_model(opt)
    var.loops             = [];
    var.loops_bc          = [];
    
+   cache_key = setup_cache_key(opt);
+   [cached, found] = setup_model_cache('get', cache_key);
+   if found
+      var       = cached.var;
+      dh        = cached.dh;
+      initState = cached.initState;
+      model     = cached.model;
+      schedule  = setup_schedule();
+      return;
+   end
+
    set_formation(opt.formation);
       
    dh = [];
@@ -34,7 +45,6 @@ function [model, schedule, initState, dh] = setup_model(opt)
        'top_trap', dh);
                               
    model     = CO2VEBlackOilTypeModel(var.Gt, var.rock2D, fluid);
-   schedule  = setup_schedule();
 
    semiopen_faces = get_bfaces_of_type(1);
    if ~isempty(semiopen_faces)
@@ -48,6 +58,14 @@ function [model, schedule, initState, dh] = setup_model(opt)
            model.operators.T_all(semiopen_faces) .* d ./ (d + opt.outside_distance);
   end
 
+   cached.var       = var;
+   cached.dh        = dh;
+   cached.initState = initState;
+   cached.model     = model;
+   setup_model_cache('put', cache_key, cached);
+
+   schedule  = setup_schedule();
+
    % ============================= LOCAL HELPER FUNCTIONS =============================
 
    function res = get_bfaces_of_type(type)
@@ -67,7 +85,12 @@ function [model, schedule, initState, dh] = setup_model(opt)
    
       % Create wells 
       W = [];
-      wcell_ix = closest_cell(var.Gt, [cell2mat(opt.well_position), 0], 1:var.Gt.cells.num);
+      if isfield(opt, 'well_cell') && ~isempty(opt.well_cell)
+         % cell already resolved on the Python side (0-based)
+         wcell_ix = opt.well_cell + 1;
+      else
+         wcell_ix = closest_cell(var.Gt, [cell2mat(opt.well_position), 0], 1:var.Gt.cells.num);
+      end
       W = addWellVE(W, var.Gt, var.rock2D, wcell_ix , ...
                   'type'   , 'rate'               , ...
                   'val'    , opt.default_rate    , ...
@@ -159,6 +182,17 @@ end
 
 % ======================= INDEPENDENT HELPER FUNCTIONS =======================
 
+function key = setup_cache_key(opt)
+   % everything that goes into the grid, fluid and model, but not the wells
+   key = sprintf('%s|%.10g|%.10g|%.10g|%.10g|%.10g|%.10g|%.10g|%.10g|%.10g|%.10g|%.10g|%d|%d|%d', ...
+       lower(opt.formation), opt.c, opt.seafloor_temp, opt.seafloor_depth, ...
+       opt.temp_gradient, opt.water_compr_val, opt.water_density, opt.pv_mult, ...
+       opt.water_residual, opt.co2_residual, opt.dis_max, opt.outside_distance, ...
+       opt.use_dissolution, opt.use_cap_fringe, opt.use_trapping);
+end
+
+% ----------------------------------------------------------------------------
+
 function ix = closest_cell(Gt, pt, candidates)
    
    d = bsxfun(@minus, [Gt.cells.centroids(candidates,:), Gt.cells.z(candidates)], pt);
@@ -0,0 +1,50 @@
+function varargout = setup_model_cache(action, key, value)
+% Per-session cache of the formation-level products of setup_model (grid,
+% rock, boundary loops, fluid and model), keyed by formation and fluid
+% parameters. Entries are evicted least recently used first.
+%
+%   [value, found] = setup_model_cache('get', key)
+%   setup_model_cache('put', key, value)
+%   stats = setup_model_cache('stats')
+%   setup_model_cache('clear')
+
+   persistent keys values hits misses
+   max_entries = 4;
+
+   if isempty(hits)
+      keys = {}; values = {}; hits = 0; misses = 0;
+   end
+
+   switch action
+      case 'get'
+         ix = find(strcmp(keys, key), 1);
+         if isempty(ix)
+            misses = misses + 1;
+            varargout = {[], false};
+         else
+            hits = hits + 1;
+            % move to the most recently used position
+            order = [setdiff(1:numel(keys), ix), ix];
+            keys = keys(order); values = values(order);
+            varargout = {values{end}, true};
+         end
+
+      case 'put'
+         ix = find(strcmp(keys, key), 1);
+         keys(ix) = []; values(ix) = [];
+         keys{end+1} = key;
+         values{end+1} = value;
+         if numel(keys) > max_entries
+            keys(1) = []; values(1) = [];
+         end
+
+      case 'stats'
+         varargout{1} = struct('entries', numel(keys), 'hits', hits, 'misses', misses);
+
+      case 'clear'
+         keys = {}; values = {}; hits = 0; misses = 0;
+
+      otherwise
+         error('Unknown setup_model_cache action ''%s''', action);
+   end
+end
@@ -0,0 +1,72 @@
+function fn = stream_inventory(progress_file, model, initState, prefix_states, schedule, traps, dh)
+% afterStepFn for simulateScheduleAD that appends the trapping inventory of
+% every completed report step to progress_file, one CSV line per step:
+% step, time, inventory fields. prefix_states holds states computed before
+% this simulation started (e.g. a restored injection phase); schedule is
+% the full schedule they and the simulated steps belong to.
+% Creating the file <progress_file>.stop aborts the simulation after the
+% current step.
+%
+% The initial state and prefix_states are written straight away. After
+% that only the newest state is reported on; the injected total it is
+% compared against comes from the schedule, so each step costs the same.
+
+   residual = [model.fluid.res_water, model.fluid.res_gas];
+   masses = makeReports(model.G, [{initState}; prefix_states(:)], model.rock, model.fluid, ...
+       sub_schedule(schedule, numel(prefix_states)), residual, traps, dh);
+
+   % CO2 in the formation at the start plus everything injected up to each step
+   injected = zeros(numel(schedule.step.val), 1);
+   for i = 1:numel(schedule.step.val)
+      W = schedule.control(schedule.step.control(i)).W;
+      injected(i) = sum([W.val]) * schedule.step.val(i) * model.fluid.rhoGS;
+   end
+   injected = sum(masses{1}) + cumsum(injected);
+   t = cumsum(schedule.step.val);
+
+   fid = fopen(progress_file, 'a');
+   write_row(fid, 0, 0, masses{1});
+   for i = 1:numel(prefix_states)
+      write_row(fid, i, t(i), masses{i + 1});
+   end
+   fclose(fid);
+
+   fn = @(model, states, reports, solver, sim_schedule, simtime) ...
+       write_step(model, states, reports, solver, progress_file, numel(prefix_states), injected, t, traps, dh);
+end
+
+% ----------------------------------------------------------------------------
+
+function [model, states, reports, solver, ok] = write_step(model, states, reports, solver, ...
+                                                           progress_file, n_prefix, injected, t, traps, dh)
+   done = states(~cellfun(@isempty, states));
+   k = n_prefix + numel(done);
+
+   % Reported as if it were an initial state; only its leaked mass needs
+   % the injected total, which is replaced below
+   no_steps = struct('step', struct('val', [], 'control', []));
+   masses = makeReports(model.G, done(end), model.rock, model.fluid, no_steps, ...
+       [model.fluid.res_water, model.fluid.res_gas], traps, dh);
+   inventory = masses{1}(1:end-1);
+
+   fid = fopen(progress_file, 'a');
+   write_row(fid, k, t(k), [inventory, injected(k) - sum(inventory)]);
+   fclose(fid);
+
+   ok = ~exist([progress_file, '.stop'], 'file');
+end
+
+% ----------------------------------------------------------------------------
+
+function schedule = sub_schedule(schedule, n)
+   schedule.step.val     = schedule.step.val(1:n);
+   schedule.step.control = schedule.step.control(1:n);
+end
+
+% ----------------------------------------------------------------------------
+
+function write_row(fid, step, t, masses)
+   fprintf(fid, '%d', step);
+   fprintf(fid, ',%.17g', t, masses);
+   fprintf(fid, '\n');
+end
@@ -0,0 +1,53 @@
+from pymongo import UpdateOne
+
+from python.db_client.formations import FORMATIONS
+from python.db_client.mongo_client import MongoDBClient
+from python.web.simulation.cell_index import get_cell_index
+from python.web.simulation.explore_simulation import WELL_FIELDS, InitialParameters
+from python.web.simulation.result_cache import ensure_result_indexes, get_result_key
+
+BATCH_SIZE = 500
+
+
+def backfill_result_keys(
+    mongo_client: MongoDBClient
+) -> None:
+    seen_keys = set(mongo_client.db.results.distinct('key', {'well_cell': {'$exists': True}}))
+    updates = []
+    duplicates = []
+    added = 0
+
+    for result in mongo_client.db.results.find({'well_cell': {'$exists': False}}):
+        formation = FORMATIONS[result['formation_id']]
+        simulation_parameters = InitialParameters(
+            formation=formation,
+            **result['simulation_parameters']
+        ).dict(exclude=WELL_FIELDS)
+        well_cell = get_cell_index(mongo_client, formation).find_cell(result['well_location'])
+        key = get_result_key(formation, well_cell, simulation_parameters)
+
+        if key in seen_keys:
+            duplicates.append(result['_id'])
+            continue
+        seen_keys.add(key)
+        added += 1
+
+        updates.append(UpdateOne(
+            {'_id': result['_id']},
+            {'$set': {'key': key, 'well_cell': well_cell, 'simulation_parameters': simulation_parameters}}
+        ))
+        if len(updates) >= BATCH_SIZE:
+            mongo_client.db.results.bulk_write(updates, ordered=False)
+            updates = []
+
+    if updates:
+        mongo_client.db.results.bulk_write(updates, ordered=False)
+    if duplicates:
+        mongo_client.db.results.delete_many({'_id': {'$in': duplicates}})
+
+    ensure_result_indexes(mongo_client.db)
+    print(f'Keys added: {added}, duplicate results removed: {len(duplicates)}')
+
+
+if __name__ == '__main__':
+    backfill_result_keys(MongoDBClient('co2sim'))
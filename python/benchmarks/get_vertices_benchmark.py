@@ -0,0 +1,57 @@
+import os
+import sys
+import timeit
+
+import numpy as np
+from numpy import genfromtxt
+
+FORMATIONS_DIR = f'{os.path.dirname(__file__)}/../desktop/formations'
+REPEATS = 5
+
+
+def get_vertices_loop(
+    _vertices: list,
+    faces: list
+) -> np.array:
+    vertices = np.delete(_vertices, [2], 1)
+
+    vertices_new = np.zeros((len(faces), len(faces[0]), 2))
+
+    for i, face in enumerate(faces):
+        for j, vertex in enumerate(face):
+            vertices_new[i, j, 0] = vertices[int(vertex - 1), 0]
+            vertices_new[i, j, 1] = vertices[int(vertex - 1), 1]
+
+    return vertices_new
+
+
+def get_vertices_gather(
+    _vertices: list,
+    faces: list
+) -> np.array:
+    vertices = np.delete(_vertices, [2], 1)
+    faces_idx = np.asarray(faces, dtype=np.int32) - 1
+
+    return vertices[faces_idx]
+
+
+def run_benchmark(
+    formation: str
+) -> None:
+    # Mongo hands the geometry back as nested lists, so benchmark on the same input
+    vertices = genfromtxt(f'{FORMATIONS_DIR}/{formation}/vertices.csv', delimiter=',').tolist()
+    faces = genfromtxt(f'{FORMATIONS_DIR}/{formation}/faces.csv', delimiter=',').tolist()
+
+    assert np.array_equal(get_vertices_loop(vertices, faces), get_vertices_gather(vertices, faces))
+
+    loop_time = min(timeit.repeat(lambda: get_vertices_loop(vertices, faces), number=1, repeat=REPEATS))
+    gather_time = min(timeit.repeat(lambda: get_vertices_gather(vertices, faces), number=1, repeat=REPEATS))
+
+    print(f'{formation}: {len(faces)} faces')
+    print(f'Loop:    {loop_time * 1000:.1f} ms')
+    print(f'Gather:  {gather_time * 1000:.1f} ms')
+    print(f'Speed-up: {loop_time / gather_time:.0f}x')
+
+
+if __name__ == '__main__':
+    run_benchmark(sys.argv[1] if len(sys.argv) > 1 else 'utsirafm')
@@ -0,0 +1,106 @@
+import os
+import sys
+import tempfile
+import timeit
+
+import numpy as np
+from oct2py.io import read_file
+from scipy.io import savemat
+
+from python.web.simulation.engine_pool import create_engine
+from python.web.simulation.explore_simulation import YEAR, InitialParameters
+
+REPEATS = 3
+WELL_POSITION = (487000.0, 6721000.0)
+
+# A long migration schedule makes the per-step sol structs dominate the transfer
+LONG_MIGRATION = {
+    'mig_time': 1000.0 * YEAR,
+    'mig_steps': 100.0
+}
+
+
+def run_benchmark(
+    formation: str
+) -> None:
+    eng = create_engine()
+
+    initial_parameters = InitialParameters(formation=formation, **LONG_MIGRATION)
+    initial_parameters.well_position = WELL_POSITION
+    params = initial_parameters.dict()
+
+    # Warms up the model setup and trap analysis caches so only the simulation and transfer are timed
+    eng.get_simulation_results_lean(params, [], nout=2)
+
+    # get_simulation_results_lean runs the same simulation, so the difference is what oct2py ships back
+    full_time = min(timeit.repeat(
+        lambda: eng.get_simulation_results(params, nout=4),
+        number=1, repeat=REPEATS
+    ))
+    lean_time = min(timeit.repeat(
+        lambda: eng.get_simulation_results_lean(params, [], nout=2),
+        number=1, repeat=REPEATS
+    ))
+    fields_time = min(timeit.repeat(
+        lambda: eng.get_simulation_results_lean(params, ['s', 'h'], nout=3),
+        number=1, repeat=REPEATS
+    ))
+
+    print(f'{formation}: {int(initial_parameters.inj_steps + initial_parameters.mig_steps)} steps')
+    print(f'masses, t, sol, W:     {full_time:.2f} s')
+    print(f'masses, t:             {lean_time:.2f} s')
+    print(f'masses, t, final s, h: {fields_time:.2f} s')
+
+
+def run_transfer_benchmark(
+    cells: int = 5534,
+    steps: int = 106
+) -> None:
+    # Without Octave: times only the Python half of the transfer, reading back .mat files shaped like
+    # the outputs of get_simulation_results and get_simulation_results_lean. Each sol entry carries
+    # the state fields of the VE model (pressure, s, smax, flux over ~2 faces per cell, h, h_max)
+    rng = np.random.default_rng(0)
+    masses = np.empty((steps + 1,), dtype=object)
+    sol = np.empty((steps + 1,), dtype=object)
+    W = np.empty((steps + 1,), dtype=object)
+    for i in range(steps + 1):
+        masses[i] = rng.random((1, 8))
+        sol[i] = {
+            'pressure': rng.random((cells, 1)),
+            's': rng.random((cells, 2)),
+            'smax': rng.random((cells, 2)),
+            'flux': rng.random((2 * cells, 2)),
+            'h': rng.random((cells, 1)),
+            'h_max': rng.random((cells, 1))
+        }
+        W[i] = {'type': 'rate', 'val': 1.0, 'cells': 1.0}
+    t = np.cumsum(rng.random((1, steps + 1)))
+
+    outputs = {
+        'masses, t, sol, W': {'masses': masses, 't': t, 'sol': sol, 'W': W},
+        'masses, t': {'masses': np.vstack(list(masses)), 't': t},
+        'masses, t, final s, h': {
+            'masses': np.vstack(list(masses)),
+            't': t,
+            'fields': {'s': sol[-1]['s'].astype(np.float32), 'h': sol[-1]['h'].astype(np.float32)}
+        }
+    }
+
+    print(f'{cells} cells, {steps} steps')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for name, payload in outputs.items():
+            path = os.path.join(tmp_dir, 'reader.mat')
+            # scipy's writer stands in for Octave's save on the other side
+            write_time = min(timeit.repeat(lambda: savemat(path, payload), number=1, repeat=REPEATS))
+            read_time = min(timeit.repeat(lambda: read_file(path), number=1, repeat=REPEATS))
+            print(
+                f'{name + ":":<23}{os.path.getsize(path) / 2 ** 20:7.2f} MB, '
+                f'written in {write_time * 1000:6.1f} ms, read in {read_time * 1000:6.1f} ms'
+            )
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--transfer':
+        run_transfer_benchmark()
+    else:
+        run_benchmark(sys.argv[1] if len(sys.argv) > 1 else 'Utsirafm')
@@ -0,0 +1,32 @@
+from typing import Dict, Union
+
+import numpy as np
+from bson import Binary
+
+GEOMETRY_DTYPES = {
+    'vertices': '<f8',
+    'faces': '<i4',
+    'faces_trapping': '<i4',
+    'depths': '<f8'
+}
+
+
+def encode_array(
+    array: np.array,
+    dtype: str
+) -> Dict[str, any]:
+    array = np.ascontiguousarray(array, dtype=np.dtype(dtype))
+    return {
+        'dtype': array.dtype.str,
+        'shape': list(array.shape),
+        'data': Binary(array.tobytes())
+    }
+
+
+def decode_array(
+    value: Union[Dict[str, any], list]
+) -> np.array:
+    # Documents imported before the binary format hold nested lists
+    if not isinstance(value, dict):
+        return np.array(value)
+    return np.frombuffer(value['data'], dtype=np.dtype(value['dtype'])).reshape(value['shape'])
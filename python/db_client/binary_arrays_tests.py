@@ -0,0 +1,27 @@
+import unittest
+from binary_arrays import decode_array, encode_array
+import numpy as np
+
+
+class TestBinaryArrays(unittest.TestCase):
+    def test_round_trip_keeps_dtype_and_shape(self) -> None:
+        faces = np.array([[1.0, 2.0, 3.0, 4.0], [2.0, 5.0, 6.0, 3.0]])
+
+        encoded = encode_array(faces, '<i4')
+        decoded = decode_array(encoded)
+
+        self.assertEqual(encoded['dtype'], '<i4')
+        self.assertEqual(encoded['shape'], [2, 4])
+        self.assertEqual(decoded.dtype, np.dtype('<i4'))
+        np.testing.assert_array_equal(decoded, faces)
+
+    def test_decoding_does_not_copy(self) -> None:
+        decoded = decode_array(encode_array(np.arange(6.0).reshape(3, 2), '<f8'))
+        self.assertFalse(decoded.flags.writeable)
+
+    def test_legacy_lists_are_decoded(self) -> None:
+        np.testing.assert_array_equal(decode_array([[1.5, 2.5], [3.5, 4.5]]), [[1.5, 2.5], [3.5, 4.5]])
+
+
+if __name__ == '__main__':
+    unittest.main()
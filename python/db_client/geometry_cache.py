@@ -0,0 +1,75 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, Hashable
+
+import numpy as np
+
+MEGABYTE = 1024 ** 2
+DEFAULT_MAX_BYTES = int(os.environ.get('GEOMETRY_CACHE_MB', 256)) * MEGABYTE
+
+
+class FormationGeometryCache:
+    def __init__(
+        self,
+        max_bytes: int = DEFAULT_MAX_BYTES
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], np.array]
+    ) -> np.array:
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            self.misses += 1
+
+        value = loader()
+        self.put(key, value)
+        return value
+
+    def put(
+        self,
+        key: Hashable,
+        value: np.array
+    ) -> None:
+        value.setflags(write=False)
+        with self._lock:
+            if key in self._entries:
+                self.current_bytes -= self._entries.pop(key).nbytes
+            if value.nbytes > self.max_bytes:
+                return
+
+            self._entries[key] = value
+            self.current_bytes += value.nbytes
+
+            while self.current_bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self.current_bytes -= evicted.nbytes
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
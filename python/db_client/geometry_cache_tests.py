@@ -0,0 +1,38 @@
+import unittest
+from geometry_cache import FormationGeometryCache
+import numpy as np
+
+
+class TestFormationGeometryCache(unittest.TestCase):
+    def test_repeat_lookup_is_a_hit(self) -> None:
+        cache = FormationGeometryCache(max_bytes=1024)
+        loads = []
+
+        def loader() -> np.array:
+            loads.append(1)
+            return np.zeros(8)
+
+        first = cache.get_or_load(('Utsirafm', 'faces', 4), loader)
+        second = cache.get_or_load(('Utsirafm', 'faces', 4), loader)
+
+        self.assertIs(first, second)
+        self.assertEqual(len(loads), 1)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_least_recently_used_is_evicted(self) -> None:
+        cache = FormationGeometryCache(max_bytes=2 * 64)
+        cache.put('a', np.zeros(8))
+        cache.put('b', np.zeros(8))
+        cache.get_or_load('a', lambda: np.ones(8))
+        cache.put('c', np.zeros(8))
+
+        self.assertEqual(cache.stats()['entries'], 2)
+        self.assertEqual(cache.evictions, 1)
+        self.assertEqual(cache.get_or_load('b', lambda: np.ones(8))[0], 1)
+
+    def test_cached_arrays_are_read_only(self) -> None:
+        cache = FormationGeometryCache()
+        value = cache.get_or_load('a', lambda: np.zeros(8))
+
+        with self.assertRaises(ValueError):
+            value[0] = 1
@@ -1,44 +1,91 @@
+from typing import Dict, Optional
+
 import numpy as np
 from pymongo import MongoClient
 
+from python.db_client.binary_arrays import decode_array
+from python.db_client.geometry_cache import DEFAULT_MAX_BYTES, FormationGeometryCache
+
+DEFAULT_COARSENING = 4
+
 
 class MongoDBClient:
     def __init__(
         self,
-        db: str
+        db: str,
+        geometry_cache_bytes: int = DEFAULT_MAX_BYTES
     ) -> None:
         self.client = MongoClient('mongodb://mongodb:27017')
         self.db = self.client[db]
+        self.geometry_cache = FormationGeometryCache(geometry_cache_bytes)
+        self._formation_ids = {}
 
     def get_vertices(
         self,
         formation: str,
-        faces_type: str
+        faces_type: str,
+        coarsening: int = DEFAULT_COARSENING
     ) -> np.array:
+        return self.geometry_cache.get_or_load(
+            (formation, faces_type, coarsening),
+            lambda: self._load_vertices(formation, faces_type, coarsening)
+        )
 
-        formation_id = self.db.formations.find_one({'formation': formation})['_id']
-        formation_data = self.db.formations_data.find_one({'formation_id': formation_id})
-
-        _vertices = formation_data['vertices']
-        faces = formation_data[faces_type]
+    def get_colors(
+        self,
+        formation: str,
+        color_type: str,
+        coarsening: int = DEFAULT_COARSENING
+    ) -> np.array:
+        return self.geometry_cache.get_or_load(
+            (formation, color_type, coarsening),
+            lambda: self._get_formation_array(formation, coarsening, color_type)
+        )
 
-        vertices = np.delete(_vertices, [2], 1)
+    def get_formation_id(
+        self,
+        formation: str
+    ) -> int:
+        if formation not in self._formation_ids:
+            self._formation_ids[formation] = self.db.formations.find_one({'formation': formation})['_id']
+        return self._formation_ids[formation]
 
-        vertices_new = np.zeros((len(faces), len(faces[0]), 2))
+    def get_nodes(
+        self,
+        formation: str,
+        coarsening: int = DEFAULT_COARSENING
+    ) -> np.array:
+        return self.geometry_cache.get_or_load(
+            (formation, 'nodes', coarsening),
+            lambda: np.delete(self._get_formation_array(formation, coarsening, 'vertices'), [2], 1)
+        )
 
-        for i, face in enumerate(faces):
-            for j, vertex in enumerate(face):
-                vertices_new[i, j, 0] = vertices[int(vertex - 1), 0]
-                vertices_new[i, j, 1] = vertices[int(vertex - 1), 1]
+    def _load_vertices(
+        self,
+        formation: str,
+        faces_type: str,
+        coarsening: int
+    ) -> np.array:
+        faces = self._get_formation_array(formation, coarsening, faces_type)
+        faces_idx = np.asarray(faces, dtype=np.int32) - 1
 
-        return vertices_new
+        return self.get_nodes(formation, coarsening)[faces_idx]
 
-    def get_colors(
+    def _get_formation_array(
         self,
         formation: str,
-        color_type: str
+        coarsening: int,
+        field: str
     ) -> np.array:
-        formation_id = self.db.formations.find_one({'formation': formation})['_id']
-        formation_data = self.db.formations_data.find_one({'formation_id': formation_id})
+        return decode_array(self._get_formation_data(formation, coarsening, [field])[field])
 
-        return np.array(formation_data[color_type])
+    def _get_formation_data(
+        self,
+        formation: str,
+        coarsening: int,
+        fields: Optional[list] = None
+    ) -> Dict[str, any]:
+        return self.db.formations_data.find_one(
+            {'formation_id': self.get_formation_id(formation), 'coarsening': coarsening},
+            fields
+        )
@@ -2,34 +2,54 @@ import numpy as np
 from numpy import genfromtxt
 import os
 
+FORMATIONS_DIR = f'{os.path.dirname(__file__)}/formations'
+# CSV name -> .npy name and conversion. The .npy files are stored ready to index with (x, y nodes,
+# 0-based int32 faces), so their memory maps are used as they are instead of being copied on load
+FORMATION_FILES = {
+    'colours': ('colours', lambda array: array.astype(np.float64)),
+    'faces': ('faces_index', lambda array: array.astype(np.int32) - 1),
+    'faces_trapping': ('faces_trapping_index', lambda array: array.astype(np.int32) - 1),
+    'vertices': ('nodes', lambda array: np.ascontiguousarray(array[:, :2], dtype=np.float64))
+}
+
 
 def get_vertices(
     formation: str,
     faces_file: str
 ) -> np.array:
-    faces = genfromtxt(
-        f'{os.path.dirname(__file__)}/formations/{formation}/{faces_file}.csv',
-        delimiter=','
-    )
-    _vertices = genfromtxt(
-        f'{os.path.dirname(__file__)}/formations/{formation}/vertices.csv',
-        delimiter=','
-    )
+    return _load_array(formation, 'vertices')[_load_array(formation, faces_file)]
 
-    vertices = np.delete(_vertices, [2], 1)
 
-    vertices_new = np.zeros((len(faces), len(faces[0]), 2))
+def get_colors(formation: str) -> np.array:
+    return _load_array(formation, 'colours')
 
-    for i, face in enumerate(faces):
-        for j, vertex in enumerate(face):
-            vertices_new[i, j, 0] = vertices[int(vertex - 1), 0]
-            vertices_new[i, j, 1] = vertices[int(vertex - 1), 1]
 
-    return vertices_new
+def convert_formations_to_npy() -> None:
+    for formation in sorted(os.listdir(FORMATIONS_DIR)):
+        if not os.path.exists(f'{FORMATIONS_DIR}/{formation}/vertices.csv'):
+            continue
 
+        for file, (npy_file, convert) in FORMATION_FILES.items():
+            csv_path = f'{FORMATIONS_DIR}/{formation}/{file}.csv'
+            np.save(f'{FORMATIONS_DIR}/{formation}/{npy_file}.npy', convert(genfromtxt(csv_path, delimiter=',')))
+        print(f'{formation} is converted')
 
-def get_colors(formation: str) -> np.array:
-    return genfromtxt(
-        f'{os.path.dirname(__file__)}/formations/{formation}/colours.csv',
+
+def _load_array(
+    formation: str,
+    file: str
+) -> np.array:
+    # .npy files from convert_formations_to_npy are memory-mapped; the CSVs stay the source of truth
+    npy_file, convert = FORMATION_FILES[file]
+    npy_path = f'{FORMATIONS_DIR}/{formation}/{npy_file}.npy'
+    if os.path.exists(npy_path):
+        return np.load(npy_path, mmap_mode='r')
+
+    return convert(genfromtxt(
+        f'{FORMATIONS_DIR}/{formation}/{file}.csv',
         delimiter=','
-    )
+    ))
+
+
+if __name__ == '__main__':
+    convert_formations_to_npy()
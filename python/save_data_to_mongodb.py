@@ -1,48 +1,55 @@
 from numpy import genfromtxt
 import numpy as np
-import json
-import os
+from pymongo import ReplaceOne
 
-from python.desktop.gui import FORMATIONS
+from python.db_client.binary_arrays import GEOMETRY_DTYPES, encode_array
+from python.db_client.formations import FORMATIONS
+from python.db_client.mongo_client import DEFAULT_COARSENING, MongoDBClient
+
+# Geometry field -> CSV exported by convert_mat_to_csv.py
+GEOMETRY_FILES = {
+    'depths': 'colours',
+    'faces': 'faces',
+    'faces_trapping': 'faces_trapping',
+    'vertices': 'vertices'
+}
 
 
 def get_csv_file(
     formation_name: str,
     file: str
-) -> np.Array:
+) -> np.array:
     return genfromtxt(
-        f'python/desktop/formations/{formation_name}/{file}.csv',
+        f'python/desktop/formations/{formation_name.lower()}/{file}.csv',
         delimiter=','
     )
 
 
-formations_json_array = []
-formations_data_json_array = []
-for i, formation in enumerate(FORMATIONS):
-    depths_array = get_csv_file(formation, 'colours').tolist()
-    faces_array = get_csv_file(formation, 'faces').tolist()
-    faces_trapping_array = get_csv_file(formation, 'faces_trapping').tolist()
-    vertices_array = get_csv_file(formation, 'vertices').tolist()
-
-    formations_data_json_array.append({
-        'formation_id': i,
-        'coarsening': 4,
-        'depths': depths_array,
-        'faces': faces_array,
-        'faces_trapping': faces_trapping_array,
-        'vertices': vertices_array
-    })
-
-    formations_json_array.append({
-        '_id': i,
-        'formation': formation
-    })
-
-with open('formations_data.json', 'w') as f:
-    json.dump(formations_data_json_array, f)
-
-with open('formations.json', 'w') as f:
-    json.dump(formations_json_array, f)
-
-os.system('mongoimport --jsonArray -d co2sim -c formations_data formations_data.json')
-os.system('mongoimport --jsonArray -d co2sim -c formations formations.json')
+def save_data_to_mongodb(
+    mongo_client: MongoDBClient,
+    coarsening: int = DEFAULT_COARSENING
+) -> None:
+    formations = []
+    formations_data = []
+    for i, formation in enumerate(FORMATIONS):
+        formation_data = {
+            'formation_id': i,
+            'coarsening': coarsening
+        }
+        for field, file in GEOMETRY_FILES.items():
+            formation_data[field] = encode_array(get_csv_file(formation, file), GEOMETRY_DTYPES[field])
+
+        formations_data.append(ReplaceOne(
+            {'formation_id': i, 'coarsening': coarsening},
+            formation_data,
+            upsert=True
+        ))
+        formations.append(ReplaceOne({'_id': i}, {'_id': i, 'formation': formation}, upsert=True))
+
+    mongo_client.db.formations.bulk_write(formations, ordered=False)
+    mongo_client.db.formations_data.bulk_write(formations_data, ordered=False)
+    print(f'Geometry of {len(FORMATIONS)} formations is saved')
+
+
+if __name__ == '__main__':
+    save_data_to_mongodb(MongoDBClient('co2sim'))
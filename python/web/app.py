@@ -1,5 +1,4 @@
-from typing import Optional, List, Dict
-from copy import deepcopy
+from typing import Callable, Optional, List, Dict, Tuple
 
 import dash
 from dash import dcc, html
@@ -8,24 +7,27 @@ from dash.dependencies import Input, Output, State
 from dash.exceptions import PreventUpdate
 import plotly.graph_objects as go
 import numpy as np
+import multiprocessing
 import threading
+import uuid
+from functools import partial
 import pandas as pd
 
+from python.db_client.formations import FORMATIONS
 from python.db_client.mongo_client import MongoDBClient
 from python.web.plotting.plot_trapping_distribution_web import LABELS
 from python.web.reinforcement_learning.basic_policy_web import run_basic_policy_web
 from python.web.reinforcement_learning.nn_policy_web import run_nn_policy_web
 
 from python.web.plotting.plot_formation_web import plot_formation_web
+from python.web.plotting.plot_reward_heatmap_web import plot_reward_heatmap_web
 from python.web.plotting.plot_trapping_distribution_web import plot_trapping_distribution
 
-from python.web.simulation.explore_simulation import explore_simulation, YEAR
-
-FORMATIONS = [
-    'Arefm', 'Bjarmelandfm', 'Brentgrp', 'Brynefm', 'Fensfjordfm', 'Garnfm', 'Gassumfm', 'Ilefm',
-    'Johansenfm', 'Krossfjordfm', 'Nordmelafm', 'Pliocenesand', 'Sandnesfm', 'Skadefm', 'Sognefjordfm',
-    'Statfjordfm', 'Stofm', 'Tiljefm', 'Tubaenfm', 'Ulafm', 'Utsirafm'
-]
+from python.web.simulation.engine_pool import CancellationToken, get_engine_pool
+from python.web.simulation.explore_simulation import YEAR
+from python.web.simulation.job_queue import DONE, FAILED, SimulationJobQueue
+from python.web.simulation.sweep import find_latest_sweep
+from python.web.session_store import SessionRunReplaced, create_session_store
 
 OPTIONS = [
     {'label': formation, 'value': formation}
@@ -35,221 +37,245 @@ DEFAULT_FORMATION = FORMATIONS[16]
 COLORS = ['primary', 'secondary']
 
 MONGO_CLIENT = MongoDBClient('co2sim')
+SESSION_STORE = create_session_store()
+SIMULATION_JOBS = SimulationJobQueue(SESSION_STORE)
+SIMULATION_JOBS.start()
+# Started with each app worker, so the first policy run doesn't wait for Octave to boot. Job queue workers
+# re-import this module when the app runs as __main__, and never use the pool
+ENGINE_POOL = get_engine_pool() if multiprocessing.parent_process() is None else None
 
 app = dash.Dash(external_stylesheets=[dbc.themes.MINTY])
 app.title = 'CO2 storage simulator'
 server = app.server
 
-previous_formation_graph = {}
-formation_graph = {}
-
-previous_trapping_masses = np.array([])
-trapping_masses = np.array([])
-trapping_time = np.array([])
-
-run_smart_well_location = 0
-run_basic_well_location = 0
-
-stop_smart_well_location = [True]
-stop_basic_well_location = [True]
-
-count = 0
-initial_call = True
-
-current_well_loc = (0, 0)
-
-app.layout = dbc.Container(
-    [
-        dbc.Row(
-            [
-                dbc.Col(
-                    [
-                        html.H3([
-                            'CO',
-                            html.Sub(2),
-                            ' storage simulator'
-                        ]),
-                        html.Span(
-                            'Choose a formation from the list below:'
-                        ),
-                        dcc.Dropdown(
-                            id='formation_dropdown',
-                            options=OPTIONS,
-                            value=DEFAULT_FORMATION,
-                            style={
-                                'width': '175px',
-                            }
-                        ),
-                    ],
-                ),
-                dbc.Col(
-                    [
-                        html.H5('Running options'),
-                        dbc.Button(
-                            'Simulation',
-                            id='simulation',
-                            color='info',
-                            n_clicks_timestamp='0',
-                        ),
-                        dbc.Button(
-                            'Smart well location',
-                            id='smart_well_location',
-                            color=COLORS[1],
-                            n_clicks_timestamp='0',
-                        ),
-                        dbc.Button(
-                            'Basic well location',
-                            id='basic_well_location',
-                            color=COLORS[1],
-                            n_clicks_timestamp='0',
-                        ),
-                    ],
-                    width=4
-                )
-            ],
-            justify='between',
-            align='end'
-        ),
-        html.Hr(),
-        dbc.Row(
-            [
-                dbc.Col(
-                    dbc.Spinner(
-                        dcc.Graph(
-                            id='formation_graph',
-                            style={'height': '80vh'},
-                        ),
-                        color='primary',
+# Policy runs started by this process, so a stop can kill their engines and join their threads
+POLICY_RUNS: Dict[Tuple[str, str], Tuple[threading.Thread, CancellationToken]] = {}
+POLICY_RUNS_LOCK = threading.Lock()
+POLICY_JOIN_TIMEOUT = 1
+
+
+def serve_layout() -> dbc.Container:
+    return dbc.Container(
+        [
+            dbc.Row(
+                [
+                    dbc.Col(
+                        [
+                            html.H3([
+                                'CO',
+                                html.Sub(2),
+                                ' storage simulator'
+                            ]),
+                            html.Span(
+                                'Choose a formation from the list below:'
+                            ),
+                            dcc.Dropdown(
+                                id='formation_dropdown',
+                                options=OPTIONS,
+                                value=DEFAULT_FORMATION,
+                                style={
+                                    'width': '175px',
+                                }
+                            ),
+                        ],
                     ),
-                    width=8,
-                ),
-                dbc.Col(
-                    [
-                        html.Div(
-                            [
-                                html.H5('Initial parameters'),
-                                html.P('Injection rate:'),
-                                dcc.Slider(
-                                    id='injection_rate',
-                                    min=1,
-                                    max=10,
-                                    step=1,
-                                    value=1,
-                                ),
-                                dbc.Row(
-                                    [
-                                        dbc.Col(
-                                            [
-                                                dbc.Label('Injection period', size='md'),
-                                                dcc.Input(
-                                                    id='injection_period',
-                                                    value=10,
-                                                    type='number'
-                                                ),
-                                                dbc.Label('Injection time steps', size='md'),
-                                                dcc.Input(
-                                                    id='injection_time_steps',
-                                                    value=5,
-                                                    type='number'
-                                                ),
-                                                dbc.Label('Migration period', size='md'),
-                                                dcc.Input(
-                                                    id='migration_period',
-                                                    value=10,
-                                                    type='number'
-                                                ),
-                                                dbc.Label('Migration time steps', size='md'),
-                                                dcc.Input(
-                                                    id='migration_time_steps',
-                                                    value=5,
-                                                    type='number'
-                                                ),
-                                                dcc.Checklist(
-                                                    id='traps_checkbox',
-                                                    options={
-                                                        'traps': 'Show traps',
-                                                    }
-                                                )
-                                            ],
-                                            width=6
-                                        ),
-                                        dbc.Col(
-                                            [
-                                                dbc.Label('Seafloor depth', size='md'),
-                                                dcc.Input(
-                                                    id='seafloor_depth',
-                                                    value=100,
-                                                    type='number'
-                                                ),
-                                                dbc.Label('Seafloor temperature', size='md'),
-                                                dcc.Input(
-                                                    id='seafloor_temperature',
-                                                    value=7,
-                                                    type='number'
-                                                ),
-                                                dbc.Label('Water residual', size='md'),
-                                                dcc.Input(
-                                                    id='water_residual',
-                                                    value=0.11,
-                                                    type='number'
-                                                ),
-                                                dbc.Label('CO2 residual', size='md'),
-                                                dcc.Input(
-                                                    id='co2_residual',
-                                                    value=0.21,
-                                                    type='number'
-                                                ),
-                                                dcc.Checklist(
-                                                    id='download_checkbox',
-                                                    options={
-                                                        'download': 'Download results',
-                                                    }
-                                                )
-                                            ],
-                                            width=6
-                                        ),
-                                    ]
-                                )
-                            ]
+                    dbc.Col(
+                        [
+                            html.H5('Running options'),
+                            dbc.Button(
+                                'Simulation',
+                                id='simulation',
+                                color='info',
+                                n_clicks_timestamp='0',
+                            ),
+                            dbc.Button(
+                                'Smart well location',
+                                id='smart_well_location',
+                                color=COLORS[1],
+                                n_clicks_timestamp='0',
+                            ),
+                            dbc.Button(
+                                'Basic well location',
+                                id='basic_well_location',
+                                color=COLORS[1],
+                                n_clicks_timestamp='0',
+                            ),
+                        ],
+                        width=4
+                    )
+                ],
+                justify='between',
+                align='end'
+            ),
+            html.Hr(),
+            dbc.Row(
+                [
+                    dbc.Col(
+                        dbc.Spinner(
+                            dcc.Graph(
+                                id='formation_graph',
+                                style={'height': '80vh'},
+                            ),
+                            color='primary',
                         ),
-                        html.Hr(),
-                        html.Div(
-                            [
-                                html.H5('Trapping inventory'),
-                                dbc.Spinner(
-                                    dcc.Graph(id='trapping_graph'),
-                                    color='primary'
-                                )
-                            ]
-                        ),
-                        html.Div(
-                            [
-                                dcc.Interval(
-                                    id='formation_updater',
-                                    interval=3 * 1000,
-                                    n_intervals=0,
-                                    disabled=True
-                                ),
-                                dcc.Interval(
-                                    id='trapping_graph_updater',
-                                    interval=5 * 1000,
-                                    n_intervals=0,
-                                    disabled=True
-                                ),
-                                dcc.Store(id='local_formation'),
-                                dcc.Store(id='local_trapping'),
-                                dcc.Download(id='download_simulation_results')
-                            ]
-                        )
-                    ],
-                    width=4,
-                ),
-            ],
-        ),
-        html.Hr(),
-    ],
-    fluid=True,
-)
+                        width=8,
+                    ),
+                    dbc.Col(
+                        [
+                            html.Div(
+                                [
+                                    html.H5('Initial parameters'),
+                                    html.P('Injection rate:'),
+                                    dcc.Slider(
+                                        id='injection_rate',
+                                        min=1,
+                                        max=10,
+                                        step=1,
+                                        value=1,
+                                    ),
+                                    dbc.Row(
+                                        [
+                                            dbc.Col(
+                                                [
+                                                    dbc.Label('Injection period', size='md'),
+                                                    dcc.Input(
+                                                        id='injection_period',
+                                                        value=10,
+                                                        type='number'
+                                                    ),
+                                                    dbc.Label('Injection time steps', size='md'),
+                                                    dcc.Input(
+                                                        id='injection_time_steps',
+                                                        value=5,
+                                                        type='number'
+                                                    ),
+                                                    dbc.Label('Migration period', size='md'),
+                                                    dcc.Input(
+                                                        id='migration_period',
+                                                        value=10,
+                                                        type='number'
+                                                    ),
+                                                    dbc.Label('Migration time steps', size='md'),
+                                                    dcc.Input(
+                                                        id='migration_time_steps',
+                                                        value=5,
+                                                        type='number'
+                                                    ),
+                                                    dcc.Checklist(
+                                                        id='traps_checkbox',
+                                                        options={
+                                                            'traps': 'Show traps',
+                                                        }
+                                                    ),
+                                                    dcc.Checklist(
+                                                        id='reward_map_checkbox',
+                                                        options={
+                                                            'reward_map': 'Show reward map',
+                                                        }
+                                                    )
+                                                ],
+                                                width=6
+                                            ),
+                                            dbc.Col(
+                                                [
+                                                    dbc.Label('Seafloor depth', size='md'),
+                                                    dcc.Input(
+                                                        id='seafloor_depth',
+                                                        value=100,
+                                                        type='number'
+                                                    ),
+                                                    dbc.Label('Seafloor temperature', size='md'),
+                                                    dcc.Input(
+                                                        id='seafloor_temperature',
+                                                        value=7,
+                                                        type='number'
+                                                    ),
+                                                    dbc.Label('Water residual', size='md'),
+                                                    dcc.Input(
+                                                        id='water_residual',
+                                                        value=0.11,
+                                                        type='number'
+                                                    ),
+                                                    dbc.Label('CO2 residual', size='md'),
+                                                    dcc.Input(
+                                                        id='co2_residual',
+                                                        value=0.21,
+                                                        type='number'
+                                                    ),
+                                                    dcc.Checklist(
+                                                        id='download_checkbox',
+                                                        options={
+                                                            'download': 'Download results',
+                                                        }
+                                                    )
+                                                ],
+                                                width=6
+                                            ),
+                                        ]
+                                    )
+                                ]
+                            ),
+                            html.Hr(),
+                            html.Div(
+                                [
+                                    html.H5('Trapping inventory'),
+                                    dbc.Progress(
+                                        id='simulation_progress',
+                                        value=0,
+                                        style={'height': '4px'}
+                                    ),
+                                    dbc.Spinner(
+                                        dcc.Graph(id='trapping_graph'),
+                                        color='primary'
+                                    )
+                                ]
+                            ),
+                            html.Div(
+                                [
+                                    dcc.Interval(
+                                        id='formation_updater',
+                                        interval=1 * 1000,
+                                        n_intervals=0,
+                                        disabled=True
+                                    ),
+                                    dcc.Interval(
+                                        id='trapping_graph_updater',
+                                        interval=1 * 1000,
+                                        n_intervals=0,
+                                        disabled=True
+                                    ),
+                                    dcc.Interval(
+                                        id='simulation_job_poller',
+                                        interval=1 * 1000,
+                                        n_intervals=0,
+                                        disabled=True
+                                    ),
+                                    dcc.Store(id='local_formation'),
+                                    dcc.Store(id='local_trapping'),
+                                    dcc.Store(id='formation_graph_version', data=0),
+                                    dcc.Store(id='trapping_graph_version', data=0),
+                                    dcc.Store(id='simulation_job'),
+                                    dcc.Store(id='simulation_result'),
+                                    dcc.Store(
+                                        id='session_id',
+                                        data=uuid.uuid4().hex,
+                                        storage_type='session'
+                                    ),
+                                    dcc.Download(id='download_simulation_results')
+                                ]
+                            )
+                        ],
+                        width=4,
+                    ),
+                ],
+            ),
+            html.Hr(),
+        ],
+        fluid=True,
+    )
+
+
+app.layout = serve_layout
 
 
 @app.callback(
@@ -263,13 +289,16 @@ app.layout = dbc.Container(
         Output('smart_well_location', 'n_clicks_timestamp'),
         Output('basic_well_location', 'color'),
         Output('basic_well_location', 'n_clicks_timestamp'),
-        Output('local_trapping', 'clear_data')
+        Output('local_trapping', 'clear_data'),
+        Output('simulation_job', 'data'),
+        Output('simulation_job_poller', 'disabled')
     ],
     [
         Input('simulation', 'n_clicks_timestamp'),
         Input('smart_well_location', 'n_clicks_timestamp'),
         Input('basic_well_location', 'n_clicks_timestamp'),
-        Input('local_trapping', 'data')
+        Input('local_trapping', 'data'),
+        Input('simulation_result', 'data')
     ],
     [
         State('formation_dropdown', 'value'),
@@ -282,7 +311,8 @@ app.layout = dbc.Container(
         State('seafloor_temperature', 'value'),
         State('water_residual', 'value'),
         State('co2_residual', 'value'),
-        State('download_checkbox', 'value')
+        State('download_checkbox', 'value'),
+        State('session_id', 'data')
     ],
     prevent_initial_call=True
 )
@@ -291,6 +321,7 @@ def run_simulation(
     smart_well_location: float,
     basic_well_location: float,
     figure_dict: Dict[str, any],
+    simulation_result: Optional[Dict[str, any]],
     formation: str,
     injection_rate: int,
     injection_period: int,
@@ -301,7 +332,8 @@ def run_simulation(
     seafloor_temperature: float,
     water_residual: float,
     co2_residual: float,
-    download_checkbox: List[str]
+    download_checkbox: List[str],
+    session_id: str
 ) -> [go.Figure, bool]:
     button_pressed = np.argmax(
         np.array(
@@ -314,9 +346,36 @@ def run_simulation(
         )
     )
 
+    if dash.callback_context.triggered[0]['prop_id'] == 'simulation_result.data':
+        if not simulation_result or 'masses' not in simulation_result:
+            return (dash.no_update,) * 10 + (None, True)
+
+        masses = np.array(simulation_result['masses'])
+        time = np.array(simulation_result['time'])
+        output = plot_trapping_distribution(masses, time)
+
+        download = dash.no_update
+        if download_checkbox:
+            download = _create_download_csv(masses, time)
+
+        return (
+            output,
+            download,
+            dash.no_update,
+            dash.no_update,
+            dash.no_update,
+            dash.no_update,
+            dash.no_update,
+            dash.no_update,
+            dash.no_update,
+            dash.no_update,
+            None,
+            True
+        )
+
     if button_pressed == 1:
-        masses, time = explore_simulation(
-            current_well_loc,
+        job_id = SIMULATION_JOBS.submit(
+            SESSION_STORE.get(session_id, 'current_well_loc', (0, 0)),
             formation=formation,
             default_rate=injection_rate,
             inj_time=injection_period * YEAR,
@@ -326,18 +385,12 @@ def run_simulation(
             seafloor_depth=seafloor_depth,
             seafloor_temp=seafloor_temperature,
             water_residual=water_residual,
-            co2_residual=co2_residual,
-            mongo_client=MONGO_CLIENT
+            co2_residual=co2_residual
         )
-        output = plot_trapping_distribution(masses, time)
-
-        download = dash.no_update
-        if download_checkbox:
-            download = _create_download_csv(masses, time)
 
         return (
-            output,
-            download,
+            dash.no_update,
+            dash.no_update,
             dash.no_update,
             dash.no_update,
             0,
@@ -346,30 +399,29 @@ def run_simulation(
             dash.no_update,
             dash.no_update,
             dash.no_update,
+            job_id,
+            False
         )
 
     elif button_pressed == 2:
-        global run_smart_well_location
-        global stop_smart_well_location
-
-        run_smart_well_location = bool((run_smart_well_location + 1) % 2)
+        run_smart_well_location = not SESSION_STORE.get(session_id, 'run_smart_well_location', False)
+        SESSION_STORE.set(session_id, 'run_smart_well_location', run_smart_well_location)
 
         if run_smart_well_location:
             trapping_graph = dash.no_update
             local_trapping = False
 
-            reset_formation_graph()
-            reset_trapping_graph()
-            stop_smart_well_location.pop()
-
-            smart_well_location_thread = threading.Thread(
-                target=run_nn_policy_web,
-                name='smart_well_location',
-                kwargs={
+            reset_formation_graph(session_id)
+            reset_trapping_graph(session_id)
+            stop_policy_run(session_id, 'smart_well_location')
+            start_policy_run(
+                session_id,
+                'smart_well_location',
+                run_nn_policy_web,
+                {
                     'formation': formation,
-                    'formation_graph_callback': set_formation_graph_callback,
-                    'trapping_graph_callback': set_trapping_graph_callback,
-                    'stop_smart_well_location': stop_smart_well_location,
+                    'formation_graph_callback': partial(set_formation_graph_callback, session_id),
+                    'trapping_graph_callback': partial(set_trapping_graph_callback, session_id),
                     'default_rate': injection_rate,
                     'inj_time': injection_period * YEAR,
                     'inj_steps': injection_time_steps,
@@ -379,14 +431,14 @@ def run_simulation(
                     'seafloor_temp': seafloor_temperature,
                     'water_residual': water_residual,
                     'co2_residual': co2_residual,
-                    'mongo_client': MONGO_CLIENT
+                    'mongo_client': MONGO_CLIENT,
+                    'engine_pool': ENGINE_POOL
                 }
             )
-            smart_well_location_thread.start()
         else:
-            stop_smart_well_location.append(True)
-            reset_formation_graph()
-            reset_trapping_graph()
+            stop_policy_run(session_id, 'smart_well_location')
+            reset_formation_graph(session_id)
+            reset_trapping_graph(session_id)
             trapping_graph = 'Empty graph'
             local_trapping = True
 
@@ -400,31 +452,30 @@ def run_simulation(
             0,
             dash.no_update,
             dash.no_update,
-            local_trapping
+            local_trapping,
+            dash.no_update,
+            dash.no_update
         )
 
     elif button_pressed == 3:
-        global run_basic_well_location
-        global stop_basic_well_location
-
-        run_basic_well_location = bool((run_basic_well_location + 1) % 2)
+        run_basic_well_location = not SESSION_STORE.get(session_id, 'run_basic_well_location', False)
+        SESSION_STORE.set(session_id, 'run_basic_well_location', run_basic_well_location)
 
         if run_basic_well_location:
             trapping_graph = dash.no_update
             local_trapping = False
 
-            reset_formation_graph()
-            reset_trapping_graph()
-            stop_basic_well_location.pop()
-
-            basic_well_location_thread = threading.Thread(
-                target=run_basic_policy_web,
-                name='basic_well_location',
-                kwargs={
+            reset_formation_graph(session_id)
+            reset_trapping_graph(session_id)
+            stop_policy_run(session_id, 'basic_well_location')
+            start_policy_run(
+                session_id,
+                'basic_well_location',
+                run_basic_policy_web,
+                {
                     'formation': formation,
-                    'formation_graph_callback': set_formation_graph_callback,
-                    'trapping_graph_callback': set_trapping_graph_callback,
-                    'stop_basic_well_location': stop_basic_well_location,
+                    'formation_graph_callback': partial(set_formation_graph_callback, session_id),
+                    'trapping_graph_callback': partial(set_trapping_graph_callback, session_id),
                     'default_rate': injection_rate,
                     'inj_time': injection_period * YEAR,
                     'inj_steps': injection_time_steps,
@@ -433,14 +484,15 @@ def run_simulation(
                     'seafloor_depth': seafloor_depth,
                     'seafloor_temp': seafloor_temperature,
                     'water_residual': water_residual,
-                    'co2_residual': co2_residual
+                    'co2_residual': co2_residual,
+                    'mongo_client': MONGO_CLIENT,
+                    'engine_pool': ENGINE_POOL
                 }
             )
-            basic_well_location_thread.start()
         else:
-            stop_basic_well_location.append(True)
-            reset_formation_graph()
-            reset_trapping_graph()
+            stop_policy_run(session_id, 'basic_well_location')
+            reset_formation_graph(session_id)
+            reset_trapping_graph(session_id)
             trapping_graph = 'Empty graph'
             local_trapping = True
 
@@ -454,7 +506,9 @@ def run_simulation(
             dash.no_update,
             COLORS[not run_basic_well_location],
             0,
-            local_trapping
+            local_trapping,
+            dash.no_update,
+            dash.no_update
         )
 
     if figure_dict:
@@ -468,12 +522,44 @@ def run_simulation(
             dash.no_update,
             dash.no_update,
             dash.no_update,
+            dash.no_update,
+            dash.no_update,
             dash.no_update
         )
     else:
         raise PreventUpdate
 
 
+@app.callback(
+    [
+        Output('simulation_result', 'data'),
+        Output('simulation_progress', 'value')
+    ],
+    Input('simulation_job_poller', 'n_intervals'),
+    State('simulation_job', 'data'),
+    prevent_initial_call=True
+)
+def poll_simulation_job(
+    n_intervals: int,
+    job_id: Optional[str]
+) -> [Dict[str, any], int]:
+    status = SIMULATION_JOBS.status(job_id) if job_id else None
+    if not status:
+        return {'error': 'Unknown simulation job'}, 0
+
+    if status['status'] == DONE:
+        SIMULATION_JOBS.forget(job_id)
+        result = status['result']
+        return {'masses': result['masses'].tolist(), 'time': result['time'].tolist()}, 100
+
+    if status['status'] == FAILED:
+        SIMULATION_JOBS.forget(job_id)
+        print(f'Simulation job {job_id} failed: {status["error"]}')
+        return {'error': status['error']}, 0
+
+    return dash.no_update, int(status['progress'] * 100)
+
+
 def _create_download_csv(
     masses: np.array,
     time: np.array
@@ -488,29 +574,33 @@ def _create_download_csv(
         Input('formation_graph', 'clickData'),
         Input('formation_dropdown', 'value'),
         Input('local_formation', 'data'),
-        Input('traps_checkbox', 'value')
+        Input('traps_checkbox', 'value'),
+        Input('reward_map_checkbox', 'value')
     ],
-    State('formation_graph', 'figure')
+    [
+        State('formation_graph', 'figure'),
+        State('session_id', 'data')
+    ]
 )
 def _plot_formation_with_well(
     click_data: Optional[Dict[str, List[Dict[str, float]]]],
     formation: str,
     figure_dict: Dict[str, any],
     traps: List[str],
-    current_figure: Dict[str, any]
+    reward_map: List[str],
+    current_figure: Dict[str, any],
+    session_id: str
 ) -> [go.Figure, bool]:
     ctx = dash.callback_context
     triggered_input = ctx.triggered
 
     use_trapping = True if traps else False
 
-    global previous_formation_graph
-
     if triggered_input[0]['prop_id'] == 'local_formation.data' and figure_dict:
         return go.Figure(**figure_dict)
 
     elif triggered_input[0]['prop_id'] == 'formation_dropdown.value':
-        previous_formation_graph = plot_formation_web(formation, MONGO_CLIENT).to_dict()
+        SESSION_STORE.set(session_id, 'previous_formation_graph', plot_formation_web(formation, MONGO_CLIENT).to_dict())
         return plot_formation_web(formation, MONGO_CLIENT, use_trapping=use_trapping)
 
     elif triggered_input[0]['prop_id'] == 'formation_graph.clickData':
@@ -518,94 +608,175 @@ def _plot_formation_with_well(
         y = click_data['points'][0]['y']
         marker = (x, y)
 
-        global current_well_loc
-        current_well_loc = marker
-
-        previous_formation_graph = plot_formation_web(formation, MONGO_CLIENT, marker=marker).to_dict()
+        SESSION_STORE.update(session_id, {
+            'current_well_loc': marker,
+            'previous_formation_graph': plot_formation_web(formation, MONGO_CLIENT, marker=marker).to_dict()
+        })
         return plot_formation_web(formation, MONGO_CLIENT, marker=marker, use_trapping=use_trapping)
 
+    elif triggered_input[0]['prop_id'] == 'reward_map_checkbox.value':
+        sweep = find_latest_sweep(MONGO_CLIENT, formation) if reward_map else None
+        if sweep:
+            return plot_reward_heatmap_web(MONGO_CLIENT, sweep)
+        if reward_map:
+            print(f'No reward sweep of {formation} to show')
+        return go.Figure(**SESSION_STORE.get(session_id, 'previous_formation_graph', {}))
+
     elif triggered_input[0]['prop_id'] == 'traps_checkbox.value':
         if use_trapping:
-            previous_formation_graph = current_figure
+            SESSION_STORE.set(session_id, 'previous_formation_graph', current_figure)
             return plot_formation_web(formation, MONGO_CLIENT, use_trapping=use_trapping, current_figure=current_figure)
         else:
-            return go.Figure(**previous_formation_graph)
+            return go.Figure(**SESSION_STORE.get(session_id, 'previous_formation_graph', {}))
 
     else:
         return plot_formation_web(formation, MONGO_CLIENT, use_trapping=use_trapping)
 
 
 @app.callback(
-    Output('local_formation', 'data'),
+    [
+        Output('local_formation', 'data'),
+        Output('formation_graph_version', 'data')
+    ],
     Input('formation_updater', 'n_intervals'),
+    [
+        State('session_id', 'data'),
+        State('formation_graph_version', 'data')
+    ],
     prevent_initial_call=True
 )
 def dynamic_figure_update(
-    n_intervals: int
-) -> Dict[str, any]:
-    global previous_formation_graph
-    formation_graph_with_colorbar = {}
+    n_intervals: int,
+    session_id: str,
+    seen_version: int
+) -> [Dict[str, any], int]:
+    version = SESSION_STORE.get_version(session_id, 'formation_graph')
+    if version == seen_version:
+        raise PreventUpdate
 
+    formation_graph = SESSION_STORE.get(session_id, 'formation_graph', {})
     if formation_graph:
-        formation_graph_with_colorbar = deepcopy(formation_graph)
-        del formation_graph['data'][0]  # delete first cell with colorbar
-
-    if formation_graph != previous_formation_graph:
-        previous_formation_graph = formation_graph
-        return formation_graph_with_colorbar
-    else:
-        return dash.no_update
+        SESSION_STORE.set(session_id, 'previous_formation_graph', {
+            **formation_graph,
+            'data': formation_graph['data'][1:]  # skip first cell with colorbar
+        })
+    return formation_graph, version
 
 
 @app.callback(
-    Output('local_trapping', 'data'),
+    [
+        Output('local_trapping', 'data'),
+        Output('trapping_graph_version', 'data')
+    ],
     Input('trapping_graph_updater', 'n_intervals'),
+    [
+        State('session_id', 'data'),
+        State('trapping_graph_version', 'data')
+    ],
     prevent_initial_call=True
 )
 def dynamic_trapping_graph_update(
-    n_intervals: int
-) -> Dict[str, any]:
-    global previous_trapping_masses
-    global count
-    count += 1
-    print(f'Attempt {count}')
-    if not np.array_equal(trapping_masses, previous_trapping_masses):
-        print(f'Attempt succeeded')
-        previous_trapping_masses = trapping_masses
-        return plot_trapping_distribution(trapping_masses, trapping_time).to_dict()
-    else:
-        return dash.no_update
+    n_intervals: int,
+    session_id: str,
+    seen_version: int
+) -> [Dict[str, any], int]:
+    version = SESSION_STORE.get_version(session_id, 'trapping_graph')
+    if version == seen_version:
+        raise PreventUpdate
 
+    trapping_masses = SESSION_STORE.get(session_id, 'trapping_masses')
+    trapping_time = SESSION_STORE.get(session_id, 'trapping_time')
+    return plot_trapping_distribution(trapping_masses, trapping_time).to_dict(), version
 
-def reset_formation_graph() -> None:
-    global previous_formation_graph
-    global formation_graph
-    previous_formation_graph = {}
-    formation_graph = {}
+
+def reset_formation_graph(
+    session_id: str
+) -> None:
+    SESSION_STORE.update(session_id, {
+        'previous_formation_graph': {},
+        'formation_graph': {}
+    })
 
 
-def reset_trapping_graph() -> None:
-    global previous_trapping_masses
-    global trapping_masses
-    previous_trapping_masses = []
-    trapping_masses = []
+def reset_trapping_graph(
+    session_id: str
+) -> None:
+    SESSION_STORE.update(session_id, {
+        'trapping_masses': [],
+        'trapping_time': []
+    })
 
 
 def set_formation_graph_callback(
+    session_id: str,
     fig: Dict[str, any]
 ) -> None:
-    global formation_graph
-    formation_graph = fig
+    SESSION_STORE.set(session_id, 'formation_graph', fig)
+    SESSION_STORE.increment(session_id, 'formation_graph')
 
 
 def set_trapping_graph_callback(
+    session_id: str,
     masses: np.array,
     time: np.array
 ) -> None:
-    global trapping_masses
-    global trapping_time
-    trapping_masses = masses
-    trapping_time = time
+    SESSION_STORE.update(session_id, {
+        'trapping_masses': masses,
+        'trapping_time': time
+    })
+    SESSION_STORE.increment(session_id, 'trapping_graph')
+
+
+def start_policy_run(
+    session_id: str,
+    name: str,
+    target: Callable,
+    kwargs: Dict[str, any]
+) -> None:
+    # The token also watches the session's current run id, for stops and restarts that reach another
+    # app worker: a new run id cancels the old run even when the stop itself was never seen here
+    run_id = uuid.uuid4().hex
+    SESSION_STORE.set(session_id, f'{name}_run', run_id)
+    cancel_token = CancellationToken(SessionRunReplaced(SESSION_STORE, session_id, f'{name}_run', run_id))
+    thread = threading.Thread(
+        target=_run_policy,
+        name=name,
+        args=(session_id, name, target, {**kwargs, 'cancel_token': cancel_token}),
+        daemon=True
+    )
+    with POLICY_RUNS_LOCK:
+        POLICY_RUNS[(session_id, name)] = (thread, cancel_token)
+    thread.start()
+
+
+def stop_policy_run(
+    session_id: str,
+    name: str
+) -> None:
+    SESSION_STORE.set(session_id, f'{name}_run', None)
+    with POLICY_RUNS_LOCK:
+        run = POLICY_RUNS.pop((session_id, name), None)
+    if run:
+        thread, cancel_token = run
+        cancel_token.cancel()
+        thread.join(POLICY_JOIN_TIMEOUT)
+        if thread.is_alive():
+            print(f'{name} of session {session_id} is still shutting down')
+
+
+def _run_policy(
+    session_id: str,
+    name: str,
+    target: Callable,
+    kwargs: Dict[str, any]
+) -> None:
+    try:
+        target(**kwargs)
+    finally:
+        with POLICY_RUNS_LOCK:
+            run = POLICY_RUNS.get((session_id, name))
+            if run and run[0] is threading.current_thread():
+                del POLICY_RUNS[(session_id, name)]
 
 
 if __name__ == '__main__':
@@ -1,12 +1,16 @@
 from typing import Optional, Tuple, Dict, List
 
+import numpy as np
 import plotly.graph_objects as go
 from matplotlib import cm
 from matplotlib.colors import to_rgb
 
 from python.db_client.mongo_client import MongoDBClient
+from python.web.simulation.trap_cache import get_trap_boundary_vertices
 
 COLOUR_INTENSITY = 0.85
+COLOUR_BINS = 64
+COORDINATE_DECIMALS = 1
 
 
 def plot_formation_web(
@@ -14,7 +18,8 @@ def plot_formation_web(
     mongo_client: MongoDBClient,
     marker: Optional[Tuple[float, float]] = None,
     use_trapping=False,
-    current_figure: Optional[Dict[str, any]] = None
+    current_figure: Optional[Dict[str, any]] = None,
+    batched=True
 ) -> go.Figure:
     if current_figure:
         fig = go.Figure(**current_figure)
@@ -31,36 +36,20 @@ def plot_formation_web(
             }
         )
 
-        vertices_formation = mongo_client.get_vertices(formation, 'faces').tolist()
+        vertices_formation = mongo_client.get_vertices(formation, 'faces')
         _colors_formation = mongo_client.get_colors(formation, 'depths')
         colors_formation = _colors_formation / COLOUR_INTENSITY / _colors_formation.max()
 
-        color_tuples = [
-            to_rgb(cm.viridis(color))
-            for color in colors_formation
-        ]
-
-        xs_formation, ys_formation = _convert_vertices_to_x_y_arrays(vertices_formation)
-
         colorscale = [
             [0, f'rgb{to_rgb(cm.viridis(min(colors_formation)))}'],
             [0.5, f'rgb{to_rgb(cm.viridis(sum(colors_formation) / len(colors_formation)))}'],
             [1, f'rgb{to_rgb(cm.viridis(max(colors_formation)))}']
         ]
 
-        i = 0
-        marker_without_colorbar = {'opacity': 0}
-        for x, y in zip(xs_formation, ys_formation):
-            if i == 0:
-                marker_with_colorbar = {
-                    'colorscale': colorscale,
-                    'colorbar': {'title': 'Depth'},
-                    'color': _colors_formation,
-                    'opacity': 0
-                }
-                _add_trace(fig, x, y, i, marker_with_colorbar, color_tuples[i])
-            _add_trace(fig, x, y, i, marker_without_colorbar, color_tuples[i])
-            i += 1
+        if batched:
+            _add_batched_cell_traces(fig, vertices_formation, _colors_formation, colors_formation, colorscale)
+        else:
+            _add_cell_traces(fig, vertices_formation.tolist(), _colors_formation, colors_formation, colorscale)
 
         if marker:
             fig.add_trace(
@@ -81,29 +70,112 @@ def plot_formation_web(
         )
 
     if use_trapping:
-        vertices_trapping = mongo_client.get_vertices(formation, 'faces_trapping')
-        xs_trapping, ys_trapping = _convert_vertices_to_x_y_arrays(vertices_trapping)
-
-        i = 0
-        for x, y in zip(xs_trapping, ys_trapping):
-            fig.add_trace(
-                go.Scatter(
-                    x=x,
-                    y=y,
-                    line={'width': 1.5},
-                    marker={
-                        'opacity': 0,
-                        'color': 'red'
-                    },
-                    showlegend=False,
-                    name=f'Trapping boundary',
-                ),
-            )
-            i += 1
+        vertices_trapping = get_trap_boundary_vertices(mongo_client, formation)
+        if batched:
+            xs_trapping, ys_trapping = _convert_vertices_to_gapped_x_y_arrays(vertices_trapping, close=False)
+            _add_trapping_trace(fig, xs_trapping, ys_trapping)
+        else:
+            xs_trapping, ys_trapping = _convert_vertices_to_x_y_arrays(vertices_trapping)
+            for x, y in zip(xs_trapping, ys_trapping):
+                _add_trapping_trace(fig, x, y)
 
     return fig
 
 
+def _add_batched_cell_traces(
+    figure: go.Figure,
+    vertices: np.array,
+    depths: np.array,
+    colors: np.array,
+    colorscale: List[List[any]]
+) -> None:
+    figure.add_trace(
+        go.Scatter(
+            x=vertices[0, :1, 0].repeat(2),
+            y=vertices[0, :1, 1].repeat(2),
+            mode='markers',
+            marker={
+                'colorscale': colorscale,
+                'colorbar': {'title': 'Depth'},
+                'color': [depths.min(), depths.max()],
+                'opacity': 0
+            },
+            hoverinfo='skip',
+            showlegend=False,
+            name='Depth'
+        ),
+    )
+
+    bin_edges = np.linspace(colors.min(), colors.max(), COLOUR_BINS + 1)
+    bins = np.clip(np.digitize(colors, bin_edges) - 1, 0, COLOUR_BINS - 1)
+    bin_colors = (bin_edges[:-1] + bin_edges[1:]) / 2
+
+    for colour_bin in np.unique(bins):
+        xs, ys = _convert_vertices_to_gapped_x_y_arrays(vertices[bins == colour_bin])
+        figure.add_trace(
+            go.Scatter(
+                x=xs,
+                y=ys,
+                fill='toself',
+                fillcolor=f'rgb{to_rgb(cm.viridis(bin_colors[colour_bin]))}',
+                line={'width': 0},
+                mode='lines+markers',
+                marker={'opacity': 0},
+                showlegend=False,
+                name='Cells'
+            ),
+        )
+
+
+def _add_cell_traces(
+    figure: go.Figure,
+    vertices: List[List[List[float]]],
+    depths: np.array,
+    colors: np.array,
+    colorscale: List[List[any]]
+) -> None:
+    color_tuples = [
+        to_rgb(cm.viridis(color))
+        for color in colors
+    ]
+
+    xs_formation, ys_formation = _convert_vertices_to_x_y_arrays(vertices)
+
+    i = 0
+    marker_without_colorbar = {'opacity': 0}
+    for x, y in zip(xs_formation, ys_formation):
+        if i == 0:
+            marker_with_colorbar = {
+                'colorscale': colorscale,
+                'colorbar': {'title': 'Depth'},
+                'color': depths,
+                'opacity': 0
+            }
+            _add_trace(figure, x, y, i, marker_with_colorbar, color_tuples[i])
+        _add_trace(figure, x, y, i, marker_without_colorbar, color_tuples[i])
+        i += 1
+
+
+def _add_trapping_trace(
+    figure: go.Figure,
+    x: List[float],
+    y: List[float]
+) -> None:
+    figure.add_trace(
+        go.Scatter(
+            x=x,
+            y=y,
+            line={'width': 1.5},
+            marker={
+                'opacity': 0,
+                'color': 'red'
+            },
+            showlegend=False,
+            name=f'Trapping boundary',
+        ),
+    )
+
+
 def _add_trace(
     figure: go.Figure,
     x: List[float],
@@ -126,6 +198,21 @@ def _add_trace(
     )
 
 
+def _convert_vertices_to_gapped_x_y_arrays(
+    vertices: np.array,
+    close=True
+) -> [np.array, np.array]:
+    n_polygons, n_corners, _ = vertices.shape
+    n_points = n_corners + 1 if close else n_corners
+
+    gapped = np.full((n_polygons, n_points + 1, 2), np.nan)
+    gapped[:, :n_corners] = vertices.round(COORDINATE_DECIMALS)
+    if close:
+        gapped[:, n_corners] = gapped[:, 0]
+
+    return gapped[:, :, 0].ravel(), gapped[:, :, 1].ravel()
+
+
 def _convert_vertices_to_x_y_arrays(
     vertices
 ) -> [List[List[any]], List[List[any]]]:
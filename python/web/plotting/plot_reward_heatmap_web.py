@@ -0,0 +1,46 @@
+from typing import Dict
+
+import plotly.graph_objects as go
+
+from python.db_client.formations import FORMATIONS
+from python.db_client.mongo_client import MongoDBClient
+from python.web.simulation.cell_index import get_cell_index
+from python.web.simulation.sweep import RASTER_RESOLUTION, get_reward_raster
+
+
+def plot_reward_heatmap_web(
+    mongo_client: MongoDBClient,
+    sweep: Dict[str, any],
+    resolution: float = RASTER_RESOLUTION
+) -> go.Figure:
+    centroids = get_cell_index(mongo_client, FORMATIONS[sweep['formation_id']]).centroids
+    xs, ys, raster = get_reward_raster(centroids, sweep, resolution)
+
+    fig = go.Figure(
+        go.Heatmap(
+            x=xs,
+            y=ys,
+            z=raster,
+            colorscale='RdYlGn',
+            zmid=0,
+            colorbar={'title': 'Reward'},
+            hoverongaps=False,
+            name='Reward'
+        ),
+        layout={
+            'autosize': True,
+            'yaxis': {
+                'visible': False,
+                'scaleanchor': 'x'
+            },
+            'xaxis': {
+                'visible': False,
+            }
+        }
+    )
+
+    fig.update_layout(
+        margin=dict(l=0, r=0, b=0, t=0)
+    )
+
+    return fig
@@ -1,34 +1,35 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from typing import Dict, List, Optional, Tuple, Callable
 
 import numpy as np
 import oct2py
 
+from python.db_client.formations import FORMATIONS
 from python.db_client.mongo_client import MongoDBClient
 from python.web.plotting.dynamic_plotting_web import plot_well_locations_web
-from python.web.simulation.explore_simulation import explore_simulation
-
-FORMATIONS = [
-    'Arefm', 'Bjarmelandfm', 'Brentgrp', 'Brynefm', 'Fensfjordfm', 'Garnfm', 'Gassumfm', 'Ilefm',
-    'Johansenfm', 'Krossfjordfm', 'Nordmelafm', 'Pliocenesand', 'Sandnesfm', 'Skadefm', 'Sognefjordfm',
-    'Statfjordfm', 'Stofm', 'Tiljefm', 'Tubaenfm', 'Ulafm', 'Utsirafm'
-]
-
-STRUCTURAL_RESIDUAL = 0
-RESIDUAL = 1
-RESIDUAL_IN_PLUME = 2
-STRUCTURAL_PLUME = 3
-FREE_PLUME = 4
-EXITED = 5
-
-STEP_NUMBER = 10
+from python.web.reinforcement_learning.rewards import get_rewards
+from python.web.simulation.cell_index import get_cell_index
+from python.web.simulation.engine_pool import CancellationToken, OctaveEnginePool, create_engine, get_engine_pool
+from python.web.simulation.explore_simulation import EarlyStop, explore_simulation
+from python.web.simulation.surrogate import RewardSurrogate, fit_surrogate
+from python.web.simulation.sweep import find_parameter_sweep, get_best_cells, lookup_result
 
 CELLS_STEPS = 1
 CELL_INCREMENT = 2000 * CELLS_STEPS
 CENTROIDS_COUNT = 5
 NUMBER_OF_WELLS = 5
+NUMBER_OF_CANDIDATES = 5
 
 WELL_INDEX = 0
 
+STOP_POLL_INTERVAL = 0.5
+
+SURROGATE_KEEP = 3
+SURROGATE_MAX_STD = 1.0
+
+# Policy runs stop simulating a well once most of the CO2 has left the formation
+EARLY_STOP = EarlyStop(max_exited_fraction=0.5)
+
 
 def basic_policy(
     masses_dict: Dict[Tuple[float, float], np.array]
@@ -44,85 +45,202 @@ def run_basic_policy_web(
     formation_graph_callback: Optional[Callable] = None,
     trapping_graph_callback: Optional[Callable] = None,
     stop_basic_well_location: Optional[List[any]] = None,
+    engine_pool: Optional[OctaveEnginePool] = None,
+    mongo_client: Optional[MongoDBClient] = None,
+    cancel_token: Optional[CancellationToken] = None,
     **simulation_parameters
 ) -> [List[int], List[Tuple[int]]]:
     masses = {}
     paths = []
     rewards_different_inits = []
 
-    eng = get_matlab_engine()
+    # A token is falsy until cancelled, so it is compared with None rather than or-ed
+    if cancel_token is None:
+        cancel_token = CancellationToken(stop_basic_well_location)
+
+    # The shared pool is started once per process, so runs don't pay Octave start-up
+    engine_pool = engine_pool or get_engine_pool()
+    executor = ThreadPoolExecutor(
+        max_workers=min(engine_pool.size, NUMBER_OF_CANDIDATES),
+        thread_name_prefix='basic_well_location'
+    )
+
     formation = simulation_parameters['formation']
 
-    mongo_client = MongoDBClient('co2sim')
-    vertices = mongo_client.get_vertices(formation, 'faces')
-    random_centroids = get_random_centroids(vertices, CENTROIDS_COUNT)
-
-    for episode_count, centroid in enumerate(random_centroids):
-        print(f'Random initialization {episode_count}')
-        x, y = centroid
-        rewards_step = []
-        path = []
-
-        for step in range(NUMBER_OF_WELLS):
-            print(f'Step {step}')
-            _list_of_5_locations = _get_list_of_5_locations(CELL_INCREMENT, masses, x, y)
-            list_of_5_locations = list(filter(None, _list_of_5_locations))
-            current_masses = {}
-            for location in list_of_5_locations:
-                _masses, time = explore_simulation(
-                    location,
-                    eng=eng,
-                    **simulation_parameters
+    mongo_client = mongo_client or MongoDBClient('co2sim')
+    sweep = find_parameter_sweep(mongo_client, **simulation_parameters)
+    start_locations = get_start_locations(mongo_client, formation, sweep, CENTROIDS_COUNT)
+    surrogate = fit_surrogate(mongo_client, **simulation_parameters)
+
+    try:
+        for episode_count, centroid in enumerate(start_locations):
+            print(f'Random initialization {episode_count}')
+            x, y = centroid
+            rewards_step = []
+            path = []
+
+            for step in range(NUMBER_OF_WELLS):
+                print(f'Step {step}')
+                _list_of_5_locations = _get_list_of_5_locations(CELL_INCREMENT, masses, x, y)
+                list_of_5_locations = screen_locations(
+                    surrogate,
+                    list(filter(None, _list_of_5_locations)),
+                    required=(x, y)
                 )
-                current_masses.update(
-                    {
-                        location: _masses
-                    }
+                current_masses = _evaluate_locations(
+                    list_of_5_locations,
+                    executor,
+                    engine_pool,
+                    mongo_client,
+                    trapping_graph_callback,
+                    cancel_token,
+                    simulation_parameters,
+                    sweep
                 )
 
-                if trapping_graph_callback:
-                    trapping_graph_callback(_masses, time)
-
-                if stop_basic_well_location:
+                if current_masses is None:
                     return
 
-            masses.update(current_masses)
-
-            rewards = get_rewards(current_masses)
-            if len(rewards) > 0:
-                print(rewards)
-            else:
-                break
-
-            if (
-                len(rewards_step) >= 1
-                and rewards[WELL_INDEX] == rewards_step[-1]
-                or all([el < 0 for el in rewards])
-            ):
-                break
-
-            rewards_step.append(rewards[0])
-            path.append((x, y))
-
-            masses_copy = masses.copy()
-
-            del masses_copy[(x, y)]
-            x, y = basic_policy(masses_copy)
-
-        if rewards_step:
-            rewards_different_inits.append(rewards_step)
-        if path:
-            paths.append(path)
-            plot_well_locations_web(
-                formation,
-                mongo_client,
-                paths,
-                rewards_different_inits,
-                figure_callback=formation_graph_callback
-            )
+                masses.update(current_masses)
+
+                rewards = get_rewards(current_masses)
+                if len(rewards) > 0:
+                    print(rewards)
+                else:
+                    break
+
+                if (
+                    len(rewards_step) >= 1
+                    and rewards[WELL_INDEX] == rewards_step[-1]
+                    or all([el < 0 for el in rewards])
+                ):
+                    break
+
+                rewards_step.append(rewards[0])
+                path.append((x, y))
+
+                masses_copy = masses.copy()
+
+                del masses_copy[(x, y)]
+                x, y = basic_policy(masses_copy)
+
+            if rewards_step:
+                rewards_different_inits.append(rewards_step)
+            if path:
+                paths.append(path)
+                plot_well_locations_web(
+                    formation,
+                    mongo_client,
+                    paths,
+                    rewards_different_inits,
+                    figure_callback=formation_graph_callback
+                )
+    finally:
+        # Whatever is still simulating belongs to this run only, so it is killed and its workers reaped
+        cancel_token.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
     return rewards_different_inits, paths
 
 
+def _evaluate_locations(
+    locations: List[Tuple[float, float]],
+    executor: ThreadPoolExecutor,
+    engine_pool: OctaveEnginePool,
+    mongo_client: MongoDBClient,
+    trapping_graph_callback: Optional[Callable],
+    cancel_token: CancellationToken,
+    simulation_parameters: Dict[str, any],
+    sweep: Optional[Dict[str, any]] = None
+) -> Optional[Dict[Tuple[float, float], np.array]]:
+    completed_masses = {}
+
+    # Locations a reward sweep already covers are looked up instead of simulated
+    for location in locations:
+        swept = sweep and lookup_result(mongo_client, sweep, location)
+        if swept:
+            completed_masses[location] = swept[0]
+            if trapping_graph_callback:
+                trapping_graph_callback(*swept)
+
+    futures: Dict[Future, Tuple[float, float]] = {
+        executor.submit(
+            explore_simulation,
+            location,
+            mongo_client=mongo_client,
+            engine_pool=engine_pool,
+            early_stop=EARLY_STOP,
+            cancel_token=cancel_token,
+            **simulation_parameters
+        ): location
+        for location in locations
+        if location not in completed_masses
+    }
+
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=STOP_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+        # Checked first: runs killed by the token finish with SimulationCancelled
+        if cancel_token:
+            for future in pending:
+                future.cancel()
+            return None
+
+        for future in done:
+            _masses, time = future.result()
+            completed_masses[futures[future]] = _masses
+
+            if trapping_graph_callback:
+                trapping_graph_callback(_masses, time)
+
+    return {
+        location: completed_masses[location]
+        for location in locations
+    }
+
+
+def screen_locations(
+    surrogate: Optional[RewardSurrogate],
+    locations: List[Tuple[float, float]],
+    keep: int = SURROGATE_KEEP,
+    required: Optional[Tuple[float, float]] = None
+) -> List[Tuple[float, float]]:
+    if not surrogate or len(locations) <= keep:
+        return locations
+
+    mean, std = _predict_rewards(surrogate, locations)
+
+    # The surrogate picks the most promising candidates; the ones it is unsure about still get simulated
+    selected = set(np.argsort(-mean)[:keep]) | set(np.flatnonzero(std > SURROGATE_MAX_STD))
+    return [
+        location
+        for idx, location in enumerate(locations)
+        if idx in selected or location == required
+    ]
+
+
+def rank_locations(
+    surrogate: Optional[RewardSurrogate],
+    locations: List[Tuple[float, float]],
+    count: int
+) -> List[Tuple[float, float]]:
+    if not surrogate:
+        return locations[:count]
+
+    mean, _ = _predict_rewards(surrogate, locations)
+    return [locations[idx] for idx in np.argsort(-mean)[:count]]
+
+
+def _predict_rewards(
+    surrogate: RewardSurrogate,
+    locations: List[Tuple[float, float]],
+    predictions: Optional[np.array] = None
+) -> (np.array, np.array):
+    if predictions is None:
+        predictions = surrogate.predict_masses(locations)
+    rewards = np.array([get_rewards(dict(enumerate(member))) for member in predictions])
+    return rewards.mean(axis=0), rewards.std(axis=0)
+
+
 def get_random_centroids(
     vertices: np.array,
     centroids_count: int
@@ -132,22 +250,23 @@ def get_random_centroids(
     return random_centroids
 
 
-def get_matlab_engine() -> oct2py.Oct2Py:
-    eng = oct2py.Oct2Py()
-    eng.addpath(eng.genpath('/home/jovyan/octave'))
-    eng.warning('off', 'all')
+def get_start_locations(
+    mongo_client: MongoDBClient,
+    formation: str,
+    sweep: Optional[Dict[str, any]],
+    count: int
+) -> list:
+    best_cells = get_best_cells(sweep, count) if sweep else []
+    if len(best_cells) < count:
+        return get_random_centroids(mongo_client.get_vertices(formation, 'faces'), count)
 
-    return eng
+    # Climbing from the best swept cells beats starting at random ones
+    centroids = get_cell_index(mongo_client, formation).centroids
+    return [centroids[cell].tolist() for cell, _ in best_cells]
 
 
-def get_rewards(
-    masses_dict: Dict[Tuple[float, float], np.array]
-) -> np.array:
-    masses_vals = list(masses_dict.values())
-    masses_sr = [masses_val[STRUCTURAL_RESIDUAL, STEP_NUMBER] for masses_val in masses_vals]
-    masses_leaked = [masses_val[EXITED, STEP_NUMBER] for masses_val in masses_vals]
-    rewards = np.subtract(masses_sr, masses_leaked)
-    return rewards
+def get_matlab_engine() -> oct2py.Oct2Py:
+    return create_engine()
 
 
 def _get_list_of_5_locations(
@@ -0,0 +1,135 @@
+import io
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+import gridfs
+import numpy as np
+from bson import Binary
+from pymongo import ASCENDING, DESCENDING
+from pymongo.database import Database
+
+CHECKPOINTS_TO_KEEP = int(os.environ.get('CHECKPOINTS_TO_KEEP', 5))
+# Mongo documents are capped at 16 MB; bigger weight blobs go to GridFS
+GRIDFS_THRESHOLD = 8 * 1024 * 1024
+
+_indexed_databases = set()
+
+
+def encode_weights(
+    weights: List[np.array]
+) -> bytes:
+    buffer = io.BytesIO()
+    np.savez(buffer, *[np.asarray(layer_weights, dtype=np.float32) for layer_weights in weights])
+    return buffer.getvalue()
+
+
+def decode_weights(
+    data: bytes
+) -> List[np.array]:
+    with np.load(io.BytesIO(data)) as arrays:
+        return [arrays[f'arr_{idx}'] for idx in range(len(arrays.files))]
+
+
+def ensure_checkpoint_indexes(
+    db: Database
+) -> None:
+    if db.name in _indexed_databases:
+        return
+
+    db.checkpoints.create_index([('formation', ASCENDING), ('version', DESCENDING)], name='version', unique=True)
+    db.checkpoints.create_index([('formation', ASCENDING), ('mean_reward', DESCENDING)], name='mean_reward')
+    _indexed_databases.add(db.name)
+
+
+def save_checkpoint(
+    db: Database,
+    formation: str,
+    model: Dict[str, any],
+    weights: List[np.array],
+    mean_reward: float,
+    keep: int = CHECKPOINTS_TO_KEEP
+) -> Dict[str, any]:
+    ensure_checkpoint_indexes(db)
+
+    latest = db.checkpoints.find_one({'formation': formation}, {'version': 1}, sort=[('version', DESCENDING)])
+    data = encode_weights(weights)
+
+    checkpoint = {
+        'formation': formation,
+        'version': latest['version'] + 1 if latest else 1,
+        'model': model,
+        'mean_reward': mean_reward,
+        'size': len(data),
+        'created': time.time()
+    }
+    if len(data) > GRIDFS_THRESHOLD:
+        checkpoint['weights_file'] = gridfs.GridFS(db).put(data, filename=f"{formation}_{checkpoint['version']}.npz")
+    else:
+        checkpoint['weights'] = Binary(data)
+
+    checkpoint['_id'] = db.checkpoints.insert_one(checkpoint).inserted_id
+    apply_retention(db, formation, keep)
+    return checkpoint
+
+
+def load_latest_checkpoint(
+    db: Database,
+    formation: str
+) -> Optional[Tuple[Dict[str, any], List[np.array]]]:
+    ensure_checkpoint_indexes(db)
+    return _load_checkpoint(db, db.checkpoints.find_one({'formation': formation}, sort=[('version', DESCENDING)]))
+
+
+def load_best_checkpoint(
+    db: Database,
+    formation: str
+) -> Optional[Tuple[Dict[str, any], List[np.array]]]:
+    ensure_checkpoint_indexes(db)
+    return _load_checkpoint(db, db.checkpoints.find_one({'formation': formation}, sort=[('mean_reward', DESCENDING)]))
+
+
+def apply_retention(
+    db: Database,
+    formation: str,
+    keep: int = CHECKPOINTS_TO_KEEP
+) -> None:
+    checkpoints = list(db.checkpoints.find(
+        {'formation': formation},
+        {'version': 1, 'mean_reward': 1, 'weights_file': 1}
+    ))
+    expired = get_expired_versions([(el['version'], el['mean_reward']) for el in checkpoints], keep)
+    if not expired:
+        return
+
+    fs = gridfs.GridFS(db)
+    for checkpoint in checkpoints:
+        if checkpoint['version'] in expired and 'weights_file' in checkpoint:
+            fs.delete(checkpoint['weights_file'])
+    db.checkpoints.delete_many({'formation': formation, 'version': {'$in': list(expired)}})
+
+
+def get_expired_versions(
+    checkpoints: List[Tuple[int, float]],
+    keep: int
+) -> set:
+    latest = sorted(checkpoints, key=lambda el: el[0], reverse=True)[:keep]
+    best = max(checkpoints, key=lambda el: el[1], default=None)
+    retained = {version for version, _ in latest} | ({best[0]} if best else set())
+    return {version for version, _ in checkpoints} - retained
+
+
+def _load_checkpoint(
+    db: Database,
+    checkpoint: Optional[Dict[str, any]]
+) -> Optional[Tuple[Dict[str, any], List[np.array]]]:
+    if not checkpoint:
+        return None
+
+    if 'weights_file' in checkpoint:
+        data = gridfs.GridFS(db).get(checkpoint['weights_file']).read()
+    else:
+        data = checkpoint['weights']
+
+    print(f"Loaded checkpoint {checkpoint['version']} of {checkpoint['formation']}")
+    return checkpoint['model'], decode_weights(data)
@@ -0,0 +1,26 @@
+import unittest
+from model_checkpoints import decode_weights, encode_weights, get_expired_versions
+import numpy as np
+
+
+class TestModelCheckpoints(unittest.TestCase):
+    def test_weights_round_trip_as_float32(self) -> None:
+        weights = [np.arange(6, dtype=float).reshape(2, 3), np.array([0.5, -1.5])]
+
+        decoded = decode_weights(encode_weights(weights))
+
+        self.assertEqual(len(decoded), 2)
+        for original, restored in zip(weights, decoded):
+            self.assertEqual(restored.dtype, np.float32)
+            np.testing.assert_array_equal(original, restored)
+
+    def test_retention_keeps_latest_and_best(self) -> None:
+        checkpoints = [(1, 2.0), (2, 9.0), (3, 1.0), (4, 3.0), (5, 4.0)]
+        self.assertEqual(get_expired_versions(checkpoints, keep=2), {1, 3})
+
+    def test_nothing_expires_below_limit(self) -> None:
+        self.assertEqual(get_expired_versions([(1, 0.0), (2, 1.0)], keep=5), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,75 +1,116 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
 import tensorflow as tf
 from tensorflow import keras
 import numpy as np
-from typing import List, Callable, Optional, Dict
+from typing import List, Callable, Optional, Dict, Tuple
 import json
 
+from python.db_client.formations import FORMATIONS
 from python.db_client.mongo_client import MongoDBClient
-from python.web.simulation.explore_simulation import explore_simulation
-from python.web.reinforcement_learning.basic_policy_web import (
-    get_matlab_engine,
-    get_random_centroids,
-    get_rewards,
-)
+from python.web.simulation.engine_pool import CancellationToken, OctaveEnginePool, SimulationCancelled, get_engine_pool
+from python.web.simulation.explore_simulation import InitialParameters, explore_simulation
+from python.web.simulation.surrogate import RewardSurrogate, count_surrogate_results, fit_surrogate, refit_surrogate
+from python.web.simulation.sweep import find_parameter_sweep, lookup_result
+from python.web.reinforcement_learning.basic_policy_web import EARLY_STOP, get_random_centroids, rank_locations
+from python.web.reinforcement_learning.rewards import STEP_NUMBER, get_rewards
+from python.web.reinforcement_learning.model_checkpoints import load_latest_checkpoint, save_checkpoint
 from python.web.plotting.dynamic_plotting_web import plot_well_locations_web
 
-FORMATIONS = [
-    'Arefm', 'Bjarmelandfm', 'Brentgrp', 'Brynefm', 'Fensfjordfm', 'Garnfm', 'Gassumfm', 'Ilefm',
-    'Johansenfm', 'Krossfjordfm', 'Nordmelafm', 'Pliocenesand', 'Sandnesfm', 'Skadefm', 'Sognefjordfm',
-    'Statfjordfm', 'Stofm', 'Tiljefm', 'Tubaenfm', 'Ulafm', 'Utsirafm'
-]
+DIRECTIONS = np.array([[-2000, 0], [0, 2000], [2000, 0], [0, -2000]], dtype=float)
+
+# With a surrogate, episodes start from the best of this many random centroids per episode
+START_CANDIDATES = 3
 
 
 def run_one_step(
-    x: float,
-    y: float,
+    positions: np.array,
     masses: np.array,
     model: keras.models.Sequential,
-    loss_fn: keras.losses.binary_crossentropy,
-    eng: any,
+    executor: ThreadPoolExecutor,
+    engine_pool: OctaveEnginePool,
     mongo_client: MongoDBClient,
     trapping_graph_callback: Optional[Callable] = None,
-    simulation_parameters: Optional[Dict[str, any]] = None
-) -> [float, float, np.array, int, bool, List[tf.Tensor]]:
-    with tf.GradientTape() as tape:
-        probas = model(masses[np.newaxis])
-        logits = tf.math.log(probas + keras.backend.epsilon())
-        action = tf.random.categorical(logits, num_samples=1)
-        loss = tf.reduce_mean(loss_fn(action, probas))
-
-    direction = action[0, 0].numpy()
-
-    if direction == 0:
-        x -= 2000
-    elif direction == 1:
-        y += 2000
-    elif direction == 2:
-        x += 2000
-    elif direction == 3:
-        y -= 2000
-
-    grads = tape.gradient(loss, model.trainable_variables)
-    masses, time = explore_simulation(
-        (x, y),
-        mongo_client=mongo_client,
-        eng=eng,
-        **simulation_parameters
+    simulation_parameters: Optional[Dict[str, any]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    sweep: Optional[Dict[str, any]] = None
+) -> [np.array, np.array, np.array, np.array, np.array]:
+    probas = model(masses)
+    logits = tf.math.log(probas + keras.backend.epsilon())
+    actions = tf.random.categorical(logits, num_samples=1)[:, 0].numpy()
+
+    positions = positions + DIRECTIONS[actions]
+
+    _masses = simulate_locations(
+        [tuple(position) for position in positions],
+        executor,
+        engine_pool,
+        mongo_client,
+        trapping_graph_callback=trapping_graph_callback,
+        simulation_parameters=simulation_parameters,
+        cancel_token=cancel_token,
+        sweep=sweep
     )
 
-    if trapping_graph_callback:
-        trapping_graph_callback(masses, time)
+    rewards = get_rewards(dict(enumerate(_masses))).astype(int)
+    masses = np.stack([episode_masses.flatten() for episode_masses in _masses])
+    done = rewards < 0
+
+    return positions, masses, rewards, done, actions
+
+
+def simulate_locations(
+    locations: List[Tuple[float, float]],
+    executor: ThreadPoolExecutor,
+    engine_pool: OctaveEnginePool,
+    mongo_client: MongoDBClient,
+    trapping_graph_callback: Optional[Callable] = None,
+    simulation_parameters: Optional[Dict[str, any]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    sweep: Optional[Dict[str, any]] = None
+) -> List[np.array]:
+    futures = [
+        executor.submit(
+            _simulate_location, location, engine_pool, mongo_client, simulation_parameters, cancel_token, sweep
+        )
+        for location in locations
+    ]
+
+    for future in as_completed(futures):
+        masses, time = future.result()
+        if trapping_graph_callback:
+            trapping_graph_callback(masses, time)
 
-    masses_dict = {
-        (x, y): masses
-    }
-    reward = int((get_rewards(masses_dict)[0]))
-    masses = masses_dict[(x, y)].flatten()
+    return [future.result()[0] for future in futures]
 
-    done = False
-    if reward < 0:
-        done = True
 
-    return x, y, masses, reward, done, grads
+def _simulate_location(
+    location: Tuple[float, float],
+    engine_pool: OctaveEnginePool,
+    mongo_client: MongoDBClient,
+    simulation_parameters: Dict[str, any],
+    cancel_token: Optional[CancellationToken],
+    sweep: Optional[Dict[str, any]] = None
+) -> [np.array, np.array]:
+    # A reward sweep near the location answers it without going to Octave
+    swept = sweep and lookup_result(mongo_client, sweep, location)
+    if swept:
+        masses, time = swept
+    else:
+        masses, time = explore_simulation(
+            location,
+            mongo_client=mongo_client,
+            engine_pool=engine_pool,
+            early_stop=EARLY_STOP,
+            cancel_token=cancel_token,
+            **simulation_parameters
+        )
+
+    # The model takes full-length curves; an early-stopped run keeps its last step
+    missing_steps = STEP_NUMBER + 1 - masses.shape[1]
+    if missing_steps > 0:
+        masses = np.pad(masses, ((0, 0), (0, missing_steps)), mode='edge')
+    return masses, time
 
 
 def run_multiple_episodes(
@@ -77,74 +118,97 @@ def run_multiple_episodes(
     n_episodes: int,
     n_max_steps: int,
     model: keras.models,
-    loss_fn: keras.losses,
+    executor: ThreadPoolExecutor,
+    engine_pool: OctaveEnginePool,
     formation_graph_callback: Optional[Callable] = None,
     trapping_graph_callback: Optional[Callable] = None,
-    stop_smart_well_location: Optional[List[any]] = None,
-    simulation_parameters: Optional[Dict[str, any]] = None
-) -> [List[List[int]], List[List[float]]]:
-    iteration_rewards = []
-    iteration_grads = []
-    paths = []
-
-    eng = get_matlab_engine()
-
+    cancel_token: Optional[CancellationToken] = None,
+    simulation_parameters: Optional[Dict[str, any]] = None,
+    surrogate: Optional[RewardSurrogate] = None,
+    sweep: Optional[Dict[str, any]] = None
+) -> [List[List[int]], List[List[Tuple[np.array, int]]]]:
     vertices = mongo_client.get_vertices(simulation_parameters['formation'], 'faces')
-    random_centroids = get_random_centroids(vertices, n_episodes)
-
-    for centroid in random_centroids:
-        print(f'Centroid {centroid}')
-        current_rewards = []
-        current_grads = []
-        path = []
-
-        x, y = centroid
-        _masses, time = explore_simulation(
-            (x, y),
-            mongo_client=mongo_client,
-            eng=eng,
-            **simulation_parameters
+    # The surrogate only picks where episodes start; rewards always come from simulations or cached results
+    candidates = get_random_centroids(vertices, n_episodes * START_CANDIDATES if surrogate else n_episodes)
+    positions = np.array(rank_locations(surrogate, candidates, n_episodes), dtype=float)
+    print(f'Centroids {positions.tolist()}')
+
+    _masses = simulate_locations(
+        [tuple(position) for position in positions],
+        executor,
+        engine_pool,
+        mongo_client,
+        trapping_graph_callback=trapping_graph_callback,
+        simulation_parameters=simulation_parameters,
+        cancel_token=cancel_token,
+        sweep=sweep
+    )
+    masses = np.stack([episode_masses.flatten() for episode_masses in _masses])
+
+    # Episodes run in lockstep: one forward pass per step for every episode still going,
+    # while their simulations run concurrently on the engine pool
+    active = np.arange(n_episodes)
+    episode_rewards = [[] for _ in range(n_episodes)]
+    episode_steps = [[] for _ in range(n_episodes)]
+    episode_paths = [[] for _ in range(n_episodes)]
+
+    for step in range(n_max_steps):
+        print(f'Step {step}')
+        if cancel_token:
+            return None, None
+
+        observations = masses[active]
+        positions[active], masses[active], rewards, done, actions = run_one_step(
+            positions[active], observations, model, executor, engine_pool, mongo_client,
+            trapping_graph_callback=trapping_graph_callback,
+            simulation_parameters=simulation_parameters,
+            cancel_token=cancel_token,
+            sweep=sweep
         )
-        masses = _masses.flatten()
 
-        if trapping_graph_callback:
-            trapping_graph_callback(_masses, time)
+        for idx, episode in enumerate(active):
+            if done[idx]:
+                continue
+            episode_paths[episode].append(tuple(positions[episode]))
+            episode_rewards[episode].append(int(rewards[idx]))
+            episode_steps[episode].append((observations[idx], int(actions[idx])))
 
-        for step in range(n_max_steps):
-            print(f'Step {step}')
-            if stop_smart_well_location:
-                return None, None
+        active = active[~done]
+        if len(active) == 0:
+            break
 
-            x, y, masses, reward, done, grads = run_one_step(
-                x, y, masses, model, loss_fn, eng, mongo_client,
-                trapping_graph_callback=trapping_graph_callback,
-                simulation_parameters=simulation_parameters
-            )
+    iteration_rewards = [rewards for rewards in episode_rewards if rewards]
+    iteration_steps = [steps for steps in episode_steps if steps]
+    paths = [path for path in episode_paths if path]
 
-            if done:
-                break
-            path.append((x, y))
-            current_rewards.append(reward)
-            current_grads.append(grads)
+    if paths:
+        plot_well_locations_web(
+            simulation_parameters['formation'],
+            mongo_client,
+            paths,
+            iteration_rewards,
+            figure_callback=formation_graph_callback
+        )
 
-        if current_rewards:
-            iteration_rewards.append(current_rewards)
+    print(f'Current rewards {iteration_rewards}')
+    return iteration_rewards, iteration_steps
 
-        if path:
-            paths.append(path)
-            plot_well_locations_web(
-                simulation_parameters['formation'],
-                mongo_client,
-                paths,
-                iteration_rewards,
-                figure_callback=formation_graph_callback
-            )
 
-        print(f'Current rewards {current_rewards}')
-        if current_grads:
-            iteration_grads.append(current_grads)
+def get_policy_gradients(
+    model: keras.models.Sequential,
+    loss_fn: keras.losses,
+    iteration_steps: List[List[Tuple[np.array, int]]],
+    all_final_rewards: List[List[float]]
+) -> List[tf.Tensor]:
+    observations = np.stack([observation for steps in iteration_steps for observation, _ in steps])
+    actions = np.array([[action] for steps in iteration_steps for _, action in steps])
+    final_rewards = tf.constant(np.concatenate(all_final_rewards), dtype=tf.float32)
 
-    return iteration_rewards, iteration_grads
+    with tf.GradientTape() as tape:
+        probas = model(observations)
+        loss = tf.reduce_mean(final_rewards * loss_fn(actions, probas))
+
+    return tape.gradient(loss, model.trainable_variables)
 
 
 def discount_rewards(
@@ -180,6 +244,8 @@ def run_nn_policy_web(
     trapping_graph_callback: Optional[Callable] = None,
     stop_smart_well_location: Optional[List[any]] = None,
     load_last_model=True,
+    engine_pool: Optional[OctaveEnginePool] = None,
+    cancel_token: Optional[CancellationToken] = None,
     **kwargs
 ) -> None:
     n_inputs = 66
@@ -190,18 +256,21 @@ def run_nn_policy_web(
     n_max_steps = 10
     discount_rate = 0.99
 
+    formation = InitialParameters(**kwargs).formation
+
     model = None
     if load_last_model:
         try:
-            model_data = mongo_client.db.models.find_one(sort=[('_id', -1)])
-
-            model_dict = model_data['model']
-            weights = model_data['weights']
+            checkpoint = load_latest_checkpoint(mongo_client.db, formation)
+            if checkpoint:
+                model_dict, weights = checkpoint
+            else:
+                # Models saved before binary checkpoints
+                model_data = mongo_client.db.models.find_one(sort=[('_id', -1)])
+                model_dict, weights = model_data['model'], model_data['weights']
 
             model = tf.keras.models.model_from_json(json.dumps(model_dict))
-
-            for idx, layer_weights in enumerate(weights):
-                model.trainable_variables[idx].assign(layer_weights)
+            model.set_weights(weights)
         except:
             print("Couldn't load the model")
 
@@ -217,73 +286,90 @@ def run_nn_policy_web(
 
     mean_rewards = []
 
-    for iteration in range(n_iterations):
-        iteration_rewards, iteration_grads = run_multiple_episodes(
-            mongo_client,
-            n_episodes_per_update,
-            n_max_steps,
-            model,
-            loss_fn,
-            formation_graph_callback=formation_graph_callback,
-            trapping_graph_callback=trapping_graph_callback,
-            stop_smart_well_location=stop_smart_well_location,
-            simulation_parameters=kwargs
-        )
-        if stop_smart_well_location:
-            return
-        if not iteration_rewards:
-            print(f'Iteration: {iteration + 1}/{n_iterations}, no results ')
-            continue
-        mean_reward = sum(map(sum, iteration_rewards)) / n_episodes_per_update
-        print(f'All rewards: {iteration_rewards}')
-        print(f'Iteration: {iteration + 1}/{n_iterations}, mean reward: {mean_reward}')
-        mean_rewards.append(mean_reward)
-        all_final_rewards = discount_and_normalize_rewards(
-            iteration_rewards,
-            discount_rate
-        )
-        all_mean_grads = []
-        for var_index in range(len(model.trainable_variables)):
-            mean_grads = tf.reduce_mean(
-                [
-                    final_reward * iteration_grads[episode_index][step][var_index]
-                    for episode_index, final_rewards in enumerate(all_final_rewards)
-                    for step, final_reward in enumerate(final_rewards)
-                ],
-                axis=0
-            )
-            all_mean_grads.append(mean_grads)
-        optimizer.apply_gradients(zip(all_mean_grads, model.trainable_variables))
-
-        model_id = None
-        try:
-            weights = model.get_weights()
-            weights_serializable = [el.tolist() for el in weights]
+    if cancel_token is None:
+        cancel_token = CancellationToken(stop_smart_well_location)
+    # Rollouts share the process-wide pool instead of booting engines for every training run,
+    # so OCTAVE_ENGINES sets how many episodes simulate at once; more threads would only queue for engines
+    engine_pool = engine_pool or get_engine_pool()
+    executor = ThreadPoolExecutor(
+        max_workers=min(n_episodes_per_update, engine_pool.size),
+        thread_name_prefix='smart_well_location'
+    )
 
-            model_to_save = {
-                'model': json.loads(model.to_json()),
-                'weights': weights_serializable
-            }
+    sweep = find_parameter_sweep(mongo_client, **kwargs)
+    # Fitted once and refitted only after the stored results have grown
+    surrogate = fit_surrogate(mongo_client, **kwargs)
+    results_count = count_surrogate_results(mongo_client, formation)
 
-            model_id = mongo_client.db.models.insert_one(model_to_save).inserted_id
-            if model_id:
-                print(f'Model {model_id} is successfully added')
-        except:
-            print("Couldn't save model to mongo db")
+    try:
+        for iteration in range(n_iterations):
+            if iteration:
+                surrogate, results_count = refit_surrogate(mongo_client, surrogate, results_count, **kwargs)
+            iteration_rewards, iteration_steps = run_multiple_episodes(
+                mongo_client,
+                n_episodes_per_update,
+                n_max_steps,
+                model,
+                executor,
+                engine_pool,
+                formation_graph_callback=formation_graph_callback,
+                trapping_graph_callback=trapping_graph_callback,
+                cancel_token=cancel_token,
+                simulation_parameters=kwargs,
+                surrogate=surrogate,
+                sweep=sweep
+            )
+            if cancel_token:
+                return
+            if not iteration_rewards:
+                print(f'Iteration: {iteration + 1}/{n_iterations}, no results ')
+                continue
+            mean_reward = sum(map(sum, iteration_rewards)) / n_episodes_per_update
+            print(f'All rewards: {iteration_rewards}')
+            print(f'Iteration: {iteration + 1}/{n_iterations}, mean reward: {mean_reward}')
+            mean_rewards.append(mean_reward)
+            all_final_rewards = discount_and_normalize_rewards(
+                iteration_rewards,
+                discount_rate
+            )
+            all_mean_grads = get_policy_gradients(model, loss_fn, iteration_steps, all_final_rewards)
+            optimizer.apply_gradients(zip(all_mean_grads, model.trainable_variables))
 
-        if model_id:
+            model_id = None
             try:
-                metrics = {
-                    '_id': model_id,
-                    'iteration_rewards': iteration_rewards,
-                    'mean_reward': mean_reward,
-                    'sum_reward': sum(map(sum, iteration_rewards))
-                }
-
-                if mongo_client.db.metrics.insert_one(metrics).inserted_id:
-                    print(f'Metrics {model_id} are successfully added')
+                checkpoint = save_checkpoint(
+                    mongo_client.db,
+                    formation,
+                    json.loads(model.to_json()),
+                    model.get_weights(),
+                    mean_reward
+                )
+
+                model_id = checkpoint['_id']
+                print(f"Checkpoint {checkpoint['version']} of {formation} is successfully added")
             except:
-                print("Couldn't save metrics to mongo db")
+                print("Couldn't save model to mongo db")
+
+            if model_id:
+                try:
+                    metrics = {
+                        '_id': model_id,
+                        'formation': formation,
+                        'iteration_rewards': iteration_rewards,
+                        'mean_reward': mean_reward,
+                        'sum_reward': sum(map(sum, iteration_rewards))
+                    }
+
+                    if mongo_client.db.metrics.insert_one(metrics).inserted_id:
+                        print(f'Metrics {model_id} are successfully added')
+                except:
+                    print("Couldn't save metrics to mongo db")
+    except SimulationCancelled:
+        print('Smart well location is stopped')
+    finally:
+        # Kills rollouts still in flight, so the executor's threads can be joined rather than abandoned
+        cancel_token.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,24 @@
+from typing import Dict, Tuple
+
+import numpy as np
+
+STRUCTURAL_RESIDUAL = 0
+RESIDUAL = 1
+RESIDUAL_IN_PLUME = 2
+STRUCTURAL_PLUME = 3
+FREE_PLUME = 4
+EXITED = 5
+
+STEP_NUMBER = 10
+
+
+def get_rewards(
+    masses_dict: Dict[Tuple[float, float], np.array]
+) -> np.array:
+    masses_vals = list(masses_dict.values())
+    # Early-stopped runs are scored on their last computed step
+    steps = [min(STEP_NUMBER, masses_val.shape[1] - 1) for masses_val in masses_vals]
+    masses_sr = [masses_val[STRUCTURAL_RESIDUAL, step] for masses_val, step in zip(masses_vals, steps)]
+    masses_leaked = [masses_val[EXITED, step] for masses_val, step in zip(masses_vals, steps)]
+    rewards = np.subtract(masses_sr, masses_leaked)
+    return rewards
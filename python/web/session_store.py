@@ -0,0 +1,210 @@
+import os
+import pickle
+import threading
+import time
+from typing import Dict, Optional, Union
+
+SESSION_STORE_URL = os.environ.get('SESSION_STORE_URL')
+SESSION_TTL = 24 * 3600
+
+
+class InMemorySessionStore:
+    def __init__(
+        self,
+        ttl: int = SESSION_TTL
+    ) -> None:
+        self.ttl = ttl
+        self._sessions: Dict[str, Dict[str, any]] = {}
+        self._versions: Dict[str, Dict[str, int]] = {}
+        self._last_access: Dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        session_id: str,
+        key: str,
+        default: any = None
+    ) -> any:
+        with self._lock:
+            self._touch(session_id)
+            return self._sessions.get(session_id, {}).get(key, default)
+
+    def set(
+        self,
+        session_id: str,
+        key: str,
+        value: any
+    ) -> None:
+        self.update(session_id, {key: value})
+
+    def update(
+        self,
+        session_id: str,
+        values: Dict[str, any]
+    ) -> None:
+        with self._lock:
+            self._touch(session_id)
+            self._sessions.setdefault(session_id, {}).update(values)
+            self._expire()
+
+    def increment(
+        self,
+        session_id: str,
+        key: str
+    ) -> int:
+        with self._lock:
+            self._touch(session_id)
+            versions = self._versions.setdefault(session_id, {})
+            versions[key] = versions.get(key, 0) + 1
+            return versions[key]
+
+    def get_version(
+        self,
+        session_id: str,
+        key: str
+    ) -> int:
+        with self._lock:
+            return self._versions.get(session_id, {}).get(key, 0)
+
+    def delete(
+        self,
+        session_id: str
+    ) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._versions.pop(session_id, None)
+            self._last_access.pop(session_id, None)
+
+    def _touch(
+        self,
+        session_id: str
+    ) -> None:
+        self._last_access[session_id] = time.monotonic()
+
+    def _expire(self) -> None:
+        deadline = time.monotonic() - self.ttl
+        for session_id in [sid for sid, accessed in self._last_access.items() if accessed < deadline]:
+            self._sessions.pop(session_id, None)
+            self._versions.pop(session_id, None)
+            del self._last_access[session_id]
+
+
+class RedisSessionStore:
+    def __init__(
+        self,
+        url: str,
+        ttl: int = SESSION_TTL
+    ) -> None:
+        try:
+            import redis
+        except ImportError:
+            raise ImportError('SESSION_STORE_URL is set, but the redis package is not installed') from None
+
+        self.ttl = ttl
+        self._redis = redis.Redis.from_url(url)
+
+    def get(
+        self,
+        session_id: str,
+        key: str,
+        default: any = None
+    ) -> any:
+        value = self._redis.hget(_session_key(session_id), key)
+        return default if value is None else pickle.loads(value)
+
+    def set(
+        self,
+        session_id: str,
+        key: str,
+        value: any
+    ) -> None:
+        self.update(session_id, {key: value})
+
+    def update(
+        self,
+        session_id: str,
+        values: Dict[str, any]
+    ) -> None:
+        pipeline = self._redis.pipeline()
+        pipeline.hset(_session_key(session_id), mapping={k: pickle.dumps(v) for k, v in values.items()})
+        pipeline.expire(_session_key(session_id), self.ttl)
+        pipeline.execute()
+
+    def increment(
+        self,
+        session_id: str,
+        key: str
+    ) -> int:
+        pipeline = self._redis.pipeline()
+        pipeline.hincrby(_versions_key(session_id), key)
+        pipeline.expire(_versions_key(session_id), self.ttl)
+        return pipeline.execute()[0]
+
+    def get_version(
+        self,
+        session_id: str,
+        key: str
+    ) -> int:
+        return int(self._redis.hget(_versions_key(session_id), key) or 0)
+
+    def delete(
+        self,
+        session_id: str
+    ) -> None:
+        self._redis.delete(_session_key(session_id), _versions_key(session_id))
+
+
+SessionStore = Union[InMemorySessionStore, RedisSessionStore]
+
+
+class SessionFlag:
+    def __init__(
+        self,
+        store: SessionStore,
+        session_id: str,
+        key: str
+    ) -> None:
+        self.store = store
+        self.session_id = session_id
+        self.key = key
+
+    def __bool__(self) -> bool:
+        return bool(self.store.get(self.session_id, self.key, False))
+
+
+class SessionRunReplaced:
+    def __init__(
+        self,
+        store: SessionStore,
+        session_id: str,
+        key: str,
+        run_id: str
+    ) -> None:
+        self.store = store
+        self.session_id = session_id
+        self.key = key
+        self.run_id = run_id
+
+    # Unlike a stop flag, this stays set when a later run of the same kind starts
+    def __bool__(self) -> bool:
+        return self.store.get(self.session_id, self.key) != self.run_id
+
+
+def _session_key(
+    session_id: str
+) -> str:
+    return f'co2sim:session:{session_id}'
+
+
+def _versions_key(
+    session_id: str
+) -> str:
+    return f'co2sim:session:{session_id}:versions'
+
+
+def create_session_store(
+    url: Optional[str] = SESSION_STORE_URL
+) -> SessionStore:
+    if url:
+        return RedisSessionStore(url)
+    return InMemorySessionStore()
@@ -0,0 +1,48 @@
+import unittest
+from session_store import InMemorySessionStore, SessionFlag, SessionRunReplaced
+
+
+class TestInMemorySessionStore(unittest.TestCase):
+    def test_sessions_are_isolated(self) -> None:
+        store = InMemorySessionStore()
+        store.set('first', 'current_well_loc', (1.0, 2.0))
+        store.set('second', 'current_well_loc', (3.0, 4.0))
+
+        self.assertEqual(store.get('first', 'current_well_loc'), (1.0, 2.0))
+        self.assertEqual(store.get('second', 'current_well_loc'), (3.0, 4.0))
+        self.assertIsNone(store.get('third', 'current_well_loc'))
+
+    def test_idle_sessions_expire(self) -> None:
+        store = InMemorySessionStore(ttl=0)
+        store.set('first', 'run_basic_well_location', True)
+        store.set('second', 'run_basic_well_location', True)
+
+        self.assertIsNone(store.get('first', 'run_basic_well_location'))
+
+    def test_session_flag_reads_the_store(self) -> None:
+        store = InMemorySessionStore()
+        flag = SessionFlag(store, 'first', 'stop_basic_well_location')
+        self.assertFalse(flag)
+
+        store.set('first', 'stop_basic_well_location', True)
+        self.assertTrue(flag)
+
+    def test_run_flag_stays_set_after_a_restart(self) -> None:
+        store = InMemorySessionStore()
+        store.set('first', 'basic_well_location_run', 'old')
+        flag = SessionRunReplaced(store, 'first', 'basic_well_location_run', 'old')
+        self.assertFalse(flag)
+
+        store.set('first', 'basic_well_location_run', None)
+        store.set('first', 'basic_well_location_run', 'new')
+        self.assertTrue(flag)
+
+    def test_versions_only_change_on_increment(self) -> None:
+        store = InMemorySessionStore()
+        self.assertEqual(store.get_version('first', 'formation_graph'), 0)
+
+        store.increment('first', 'formation_graph')
+        store.set('first', 'formation_graph', {})
+
+        self.assertEqual(store.get_version('first', 'formation_graph'), 1)
+        self.assertEqual(store.get_version('second', 'formation_graph'), 0)
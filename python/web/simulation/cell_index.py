@@ -0,0 +1,68 @@
+from typing import Tuple
+
+import numpy as np
+
+from python.db_client.mongo_client import DEFAULT_COARSENING, MongoDBClient
+
+
+class FormationCellIndex:
+    def __init__(
+        self,
+        centroids: np.array,
+        depths: np.array
+    ) -> None:
+        self.centroids = centroids
+        self.depths = depths
+        self._depths_squared = depths ** 2
+
+    def find_cell(
+        self,
+        well_pos: Tuple[float, float]
+    ) -> int:
+        # Same metric as closest_cell in setup_model.m: the well sits at z = 0
+        distances = ((self.centroids - np.asarray(well_pos)) ** 2).sum(axis=1) + self._depths_squared
+        return int(np.argmin(distances))
+
+    def snap(
+        self,
+        well_pos: Tuple[float, float]
+    ) -> Tuple[int, Tuple[float, float]]:
+        cell = self.find_cell(well_pos)
+        x, y = self.centroids[cell]
+        return cell, (float(x), float(y))
+
+
+def get_cell_index(
+    mongo_client: MongoDBClient,
+    formation: str,
+    coarsening: int = DEFAULT_COARSENING
+) -> FormationCellIndex:
+    centroids = mongo_client.geometry_cache.get_or_load(
+        (formation, 'centroids', coarsening),
+        lambda: get_polygon_centroids(mongo_client.get_vertices(formation, 'faces', coarsening))
+    )
+    depths = mongo_client.get_colors(formation, 'depths', coarsening)
+    return FormationCellIndex(centroids, depths)
+
+
+def get_polygon_centroids(
+    vertices: np.array
+) -> np.array:
+    origin = vertices[:, :1, :]
+    x = vertices[:, :, 0] - origin[:, :, 0]
+    y = vertices[:, :, 1] - origin[:, :, 1]
+    x_next = np.roll(x, -1, axis=1)
+    y_next = np.roll(y, -1, axis=1)
+
+    cross = x * y_next - x_next * y
+    area = cross.sum(axis=1) / 2
+    degenerate = area == 0
+    area[degenerate] = 1
+
+    centroids = np.stack([
+        ((x + x_next) * cross).sum(axis=1) / (6 * area),
+        ((y + y_next) * cross).sum(axis=1) / (6 * area)
+    ], axis=1)
+    centroids[degenerate] = np.stack([x[degenerate].mean(axis=1), y[degenerate].mean(axis=1)], axis=1)
+
+    return centroids + origin[:, 0, :]
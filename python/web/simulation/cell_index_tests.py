@@ -0,0 +1,19 @@
+import unittest
+from cell_index import FormationCellIndex, get_polygon_centroids
+import numpy as np
+
+SQUARES = np.array([
+    [[0, 0], [2000, 0], [2000, 2000], [0, 2000]],
+    [[2000, 0], [4000, 0], [4000, 2000], [2000, 2000]],
+], dtype=float)
+
+
+class TestFormationCellIndex(unittest.TestCase):
+    def test_polygon_centroids(self) -> None:
+        np.testing.assert_allclose(get_polygon_centroids(SQUARES), [[1000, 1000], [3000, 1000]])
+
+    def test_clicks_inside_a_cell_snap_to_it(self) -> None:
+        cell_index = FormationCellIndex(get_polygon_centroids(SQUARES), np.array([900.0, 950.0]))
+
+        self.assertEqual(cell_index.find_cell((100.0, 1900.0)), cell_index.find_cell((1800.0, 300.0)))
+        self.assertEqual(cell_index.snap((3900.0, 100.0)), (1, (3000.0, 1000.0)))
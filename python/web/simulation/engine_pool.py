@@ -0,0 +1,315 @@
+import atexit
+import os
+import queue
+import signal
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+import oct2py
+
+OCTAVE_PATH = '/home/jovyan/octave'
+# Also the parallelism of policy rollouts and sweeps, which all run on this pool
+POOL_SIZE = int(os.environ.get('OCTAVE_ENGINES', 2))
+HEALTH_CHECK_INTERVAL = 60
+CANCEL_POLL_INTERVAL = 0.5
+ACQUIRE_POLL_INTERVAL = 0.5
+ENGINE_START_RETRIES = int(os.environ.get('OCTAVE_ENGINE_START_RETRIES', 3))
+ENGINE_START_BACKOFF = 2
+
+
+def create_engine() -> oct2py.Oct2Py:
+    eng = oct2py.Oct2Py()
+    eng.addpath(eng.genpath(OCTAVE_PATH))
+    eng.warning('off', 'all')
+
+    return eng
+
+
+def is_engine_alive(
+    eng: oct2py.Oct2Py
+) -> bool:
+    try:
+        return eng.eval('1 + 1') == 2
+    except Exception:
+        return False
+
+
+class SimulationCancelled(Exception):
+    pass
+
+
+class EngineUnavailable(RuntimeError):
+    pass
+
+
+class CancellationToken:
+    def __init__(
+        self,
+        stop_flag: Optional[Any] = None,
+        poll_interval: float = CANCEL_POLL_INTERVAL
+    ) -> None:
+        self.stop_flag = stop_flag
+        self._cancelled = threading.Event()
+        self._engines = set()
+        self._lock = threading.Lock()
+
+        # The flag may live in another process's session store, so it is polled rather than waited on
+        if stop_flag is not None:
+            threading.Thread(
+                target=self._watch_stop_flag,
+                args=(poll_interval,),
+                name='cancellation_watch',
+                daemon=True
+            ).start()
+
+    @property
+    def cancelled(self) -> bool:
+        if not self._cancelled.is_set() and self.stop_flag is not None and self.stop_flag:
+            self.cancel()
+        return self._cancelled.is_set()
+
+    def __bool__(self) -> bool:
+        return self.cancelled
+
+    def cancel(self) -> None:
+        with self._lock:
+            self._cancelled.set()
+            engines = list(self._engines)
+        for eng in engines:
+            kill_engine(eng)
+
+    @contextmanager
+    def running(
+        self,
+        eng: oct2py.Oct2Py
+    ) -> Iterator[oct2py.Oct2Py]:
+        with self._lock:
+            self._engines.add(eng)
+            cancelled = self._cancelled.is_set()
+        if cancelled:
+            kill_engine(eng)
+
+        try:
+            yield eng
+        except Exception:
+            if self._cancelled.is_set():
+                raise SimulationCancelled from None
+            raise
+        finally:
+            with self._lock:
+                self._engines.discard(eng)
+
+    def _watch_stop_flag(
+        self,
+        poll_interval: float
+    ) -> None:
+        while not self._cancelled.wait(poll_interval):
+            if self.stop_flag:
+                self.cancel()
+
+
+class OctaveEnginePool:
+    def __init__(
+        self,
+        size: int = POOL_SIZE,
+        engine_factory: Callable[[], oct2py.Oct2Py] = create_engine,
+        start_retries: int = ENGINE_START_RETRIES,
+        start_backoff: float = ENGINE_START_BACKOFF
+    ) -> None:
+        self.size = size
+        self.engine_factory = engine_factory
+        self.start_retries = start_retries
+        self.start_backoff = start_backoff
+        self._idle = queue.Queue()
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._closed = False
+        # Engines that exist (idle or checked out) and engines still being started
+        self._live = 0
+        self._starting = 0
+        self.start_error: Optional[Exception] = None
+        self.recycled = 0
+
+    def start(self) -> None:
+        for _ in range(self.size):
+            self._start_engine_async()
+
+    @contextmanager
+    def engine(
+        self,
+        timeout: Optional[float] = None,
+        cancel_token: Optional[CancellationToken] = None
+    ) -> Iterator[oct2py.Oct2Py]:
+        if cancel_token is None:
+            eng = self.acquire(timeout)
+            try:
+                yield eng
+            except Exception:
+                self.release(eng, check=True)
+                raise
+            else:
+                self.release(eng)
+            return
+
+        if cancel_token.cancelled:
+            raise SimulationCancelled
+        eng = self.acquire(timeout)
+        try:
+            with cancel_token.running(eng):
+                yield eng
+        except SimulationCancelled:
+            self._replace(eng)
+            raise
+        except Exception:
+            self.release(eng, check=True)
+            raise
+        else:
+            # A cancel that lands just as the run finishes may still have killed the engine
+            if cancel_token.cancelled:
+                self._replace(eng)
+            else:
+                self.release(eng)
+
+    def acquire(
+        self,
+        timeout: Optional[float] = None
+    ) -> oct2py.Oct2Py:
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            wait = ACQUIRE_POLL_INTERVAL
+            if deadline is not None:
+                wait = max(min(wait, deadline - time.monotonic()), 0)
+            try:
+                eng = self._idle.get(timeout=wait)
+            except queue.Empty:
+                with self._lock:
+                    exhausted = self._live == 0 and self._starting == 0
+                if exhausted:
+                    raise EngineUnavailable(f'No Octave engine could be started: {self.start_error}') from None
+                if deadline is not None and time.monotonic() >= deadline:
+                    raise EngineUnavailable(
+                        f'No idle Octave engine within {timeout} s (pool of {self.size})'
+                    ) from None
+                continue
+
+            idle_time = time.monotonic() - self._last_used.get(id(eng), 0)
+            if idle_time < HEALTH_CHECK_INTERVAL or is_engine_alive(eng):
+                return eng
+            self._recycle(eng)
+
+    def release(
+        self,
+        eng: oct2py.Oct2Py,
+        check: bool = False
+    ) -> None:
+        if self._closed:
+            self._discard(eng)
+        elif check and not is_engine_alive(eng):
+            self._recycle(eng)
+        else:
+            self._last_used[id(eng)] = time.monotonic()
+            self._idle.put(eng)
+
+    def close(self) -> None:
+        self._closed = True
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                break
+
+    def _recycle(
+        self,
+        eng: oct2py.Oct2Py
+    ) -> None:
+        print('Recycling a crashed Octave engine')
+        self.recycled += 1
+        self._replace(eng)
+
+    def _replace(
+        self,
+        eng: oct2py.Oct2Py
+    ) -> None:
+        self._discard(eng)
+        self._start_engine_async()
+
+    def _discard(
+        self,
+        eng: oct2py.Oct2Py
+    ) -> None:
+        self._last_used.pop(id(eng), None)
+        _exit_engine(eng)
+        with self._lock:
+            self._live -= 1
+
+    def _start_engine_async(self) -> None:
+        with self._lock:
+            self._starting += 1
+        threading.Thread(
+            target=self._start_engine,
+            name='octave_engine_start',
+            daemon=True
+        ).start()
+
+    def _start_engine(self) -> None:
+        try:
+            for attempt in range(self.start_retries + 1):
+                if self._closed:
+                    return
+                try:
+                    eng = self.engine_factory()
+                except Exception as e:
+                    self.start_error = e
+                    print(f"Couldn't start an Octave engine (attempt {attempt + 1}): {e}")
+                    if attempt < self.start_retries:
+                        time.sleep(self.start_backoff * 2 ** attempt)
+                    continue
+
+                with self._lock:
+                    self._live += 1
+                self.release(eng)
+                return
+        finally:
+            with self._lock:
+                self._starting -= 1
+
+
+def kill_engine(
+    eng: oct2py.Oct2Py
+) -> None:
+    # exit() only sends SIGHUP/SIGINT, which a busy solver can sit through; SIGKILL frees the CPU
+    # straight away and the thread blocked on the engine fails with an error
+    repl = getattr(getattr(eng, '_engine', None), 'repl', None)
+    if repl is None:
+        _exit_engine(eng)
+        return
+    try:
+        os.kill(repl.child.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        # Already gone, e.g. it crashed or finished exiting on its own
+        pass
+
+
+def _exit_engine(
+    eng: oct2py.Oct2Py
+) -> None:
+    try:
+        eng.exit()
+    except Exception:
+        pass
+
+
+_engine_pool = None
+_engine_pool_lock = threading.Lock()
+
+
+def get_engine_pool() -> OctaveEnginePool:
+    global _engine_pool
+    with _engine_pool_lock:
+        if _engine_pool is None:
+            _engine_pool = OctaveEnginePool()
+            _engine_pool.start()
+            atexit.register(_engine_pool.close)
+    return _engine_pool
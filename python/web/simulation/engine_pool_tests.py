@@ -0,0 +1,198 @@
+import os
+import threading
+import time
+import unittest
+
+from metakernel.replwrap import bash
+
+from engine_pool import CancellationToken, EngineUnavailable, OctaveEnginePool, SimulationCancelled
+
+
+class FakeEngine:
+    def __init__(self) -> None:
+        self.alive = True
+        self.exited = False
+
+    def eval(self, _) -> float:
+        if not self.alive:
+            raise EOFError
+        return 2.0
+
+    def exit(self) -> None:
+        self.exited = True
+        self.alive = False
+
+    def solve(self, seconds: float) -> float:
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            if not self.alive:
+                raise EOFError
+            time.sleep(0.01)
+        return 2.0
+
+
+class ReplEngine:
+    # Shaped like Oct2Py, with a real pexpect child behind _engine.repl
+    def __init__(self) -> None:
+        self._engine = type('OctaveEngine', (), {'repl': bash()})()
+        self.exited = False
+
+    @property
+    def pid(self) -> int:
+        return self._engine.repl.child.pid
+
+    def eval(self, _) -> float:
+        return 2.0
+
+    def solve(self, seconds: float) -> str:
+        return self._engine.repl.run_command(f'sleep {seconds}', timeout=None)
+
+    def exit(self) -> None:
+        self.exited = True
+        self._engine.repl.terminate()
+
+
+class Flag:
+    def __init__(self) -> None:
+        self.value = False
+
+    def __bool__(self) -> bool:
+        return self.value
+
+
+class TestOctaveEnginePool(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pool = OctaveEnginePool(size=1, engine_factory=FakeEngine)
+        self.pool.start()
+
+    def tearDown(self) -> None:
+        self.pool.close()
+
+    def test_engine_is_returned_to_pool(self) -> None:
+        with self.pool.engine(timeout=5) as eng:
+            pass
+        with self.pool.engine(timeout=5) as same_eng:
+            self.assertIs(eng, same_eng)
+
+    def test_crashed_engine_is_recycled(self) -> None:
+        with self.assertRaises(RuntimeError):
+            with self.pool.engine(timeout=5) as eng:
+                eng.alive = False
+                raise RuntimeError
+
+        with self.pool.engine(timeout=5) as new_eng:
+            self.assertIsNot(eng, new_eng)
+        self.assertTrue(eng.exited)
+        self.assertEqual(self.pool.recycled, 1)
+
+    def test_failed_start_is_retried(self) -> None:
+        failures = [RuntimeError('octave not found')] * 2
+
+        def flaky_engine() -> FakeEngine:
+            if failures:
+                raise failures.pop()
+            return FakeEngine()
+
+        pool = OctaveEnginePool(size=1, engine_factory=flaky_engine, start_retries=2, start_backoff=0.01)
+        pool.start()
+        try:
+            with pool.engine(timeout=5) as eng:
+                self.assertIsInstance(eng, FakeEngine)
+        finally:
+            pool.close()
+
+    def test_acquire_fails_once_no_engine_can_start(self) -> None:
+        def broken_engine() -> FakeEngine:
+            raise RuntimeError('octave not found')
+
+        pool = OctaveEnginePool(size=2, engine_factory=broken_engine, start_retries=1, start_backoff=0.01)
+        pool.start()
+        try:
+            with self.assertRaisesRegex(EngineUnavailable, 'octave not found'):
+                pool.acquire()
+        finally:
+            pool.close()
+
+    def test_acquire_times_out_with_pool_error(self) -> None:
+        with self.pool.engine(timeout=5):
+            with self.assertRaisesRegex(EngineUnavailable, 'within 0.1 s'):
+                self.pool.acquire(timeout=0.1)
+
+
+class TestCancellationToken(unittest.TestCase):
+    def setUp(self) -> None:
+        self.pool = OctaveEnginePool(size=1, engine_factory=FakeEngine)
+        self.pool.start()
+
+    def tearDown(self) -> None:
+        self.pool.close()
+
+    def test_cancel_interrupts_running_engine(self) -> None:
+        cancel_token = CancellationToken()
+        threading.Timer(0.1, cancel_token.cancel).start()
+
+        started = time.monotonic()
+        with self.assertRaises(SimulationCancelled):
+            with self.pool.engine(timeout=5, cancel_token=cancel_token) as eng:
+                eng.solve(30)
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(eng.exited)
+
+    def test_cancelled_engine_is_replaced(self) -> None:
+        cancel_token = CancellationToken()
+        with self.pool.engine(timeout=5, cancel_token=cancel_token) as eng:
+            cancel_token.cancel()
+
+        with self.pool.engine(timeout=5) as new_eng:
+            self.assertIsNot(eng, new_eng)
+        self.assertEqual(self.pool.recycled, 0)
+
+    def test_cancelled_token_does_not_acquire(self) -> None:
+        cancel_token = CancellationToken()
+        cancel_token.cancel()
+
+        with self.assertRaises(SimulationCancelled):
+            with self.pool.engine(timeout=5, cancel_token=cancel_token):
+                pass
+
+        with self.pool.engine(timeout=5) as eng:
+            self.assertFalse(eng.exited)
+
+    def test_other_errors_are_not_cancellations(self) -> None:
+        with self.assertRaises(RuntimeError):
+            with self.pool.engine(timeout=5, cancel_token=CancellationToken()):
+                raise RuntimeError
+
+    def test_stop_flag_cancels(self) -> None:
+        stop_flag = Flag()
+        cancel_token = CancellationToken(stop_flag, poll_interval=0.05)
+        self.assertFalse(cancel_token)
+
+        threading.Timer(0.1, setattr, args=(stop_flag, 'value', True)).start()
+        with self.assertRaises(SimulationCancelled):
+            with self.pool.engine(timeout=5, cancel_token=cancel_token) as eng:
+                eng.solve(30)
+        self.assertTrue(cancel_token.cancelled)
+
+
+class TestKillEngine(unittest.TestCase):
+    def test_cancel_kills_engine_process(self) -> None:
+        pool = OctaveEnginePool(size=1, engine_factory=ReplEngine)
+        pool.start()
+        cancel_token = CancellationToken()
+
+        try:
+            with self.assertRaises(SimulationCancelled):
+                with pool.engine(timeout=10, cancel_token=cancel_token) as eng:
+                    # Started only now: bash itself takes a while to come up
+                    started = time.monotonic()
+                    threading.Timer(0.2, cancel_token.cancel).start()
+                    eng.solve(30)
+        finally:
+            pool.close()
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(eng.exited)
+        with self.assertRaises(ProcessLookupError):
+            os.kill(eng.pid, 0)
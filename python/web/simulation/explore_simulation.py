@@ -1,21 +1,30 @@
-from typing import Optional, Tuple
+import os
+import tempfile
+import threading
+from typing import Dict, List, Optional, Tuple
 
-import oct2py
 import numpy as np
 from pymongo.errors import DuplicateKeyError
 from pydantic import BaseModel
 
+from python.db_client.formations import FORMATIONS
 from python.db_client.mongo_client import MongoDBClient
+from python.web.simulation.cell_index import get_cell_index
+from python.web.simulation.engine_pool import CancellationToken, OctaveEnginePool, get_engine_pool
+from python.web.simulation.injection_cache import prune_injection_cache, touch_injection_states
+from python.web.simulation.result_cache import find_result, get_injection_key, get_result_key
+from python.web.simulation.trap_cache import CACHE_DIR
 
 YEAR = 3600 * 24 * 365.2425
 KILOGRAM = 1000
 MEGA = KILOGRAM * 10 ** 6
 
-FORMATIONS = [
-    'Arefm', 'Bjarmelandfm', 'Brentgrp', 'Brynefm', 'Fensfjordfm', 'Garnfm', 'Gassumfm', 'Ilefm',
-    'Johansenfm', 'Krossfjordfm', 'Nordmelafm', 'Pliocenesand', 'Sandnesfm', 'Skadefm', 'Sognefjordfm',
-    'Statfjordfm', 'Stofm', 'Tiljefm', 'Tubaenfm', 'Ulafm', 'Utsirafm'
-]
+WELL_FIELDS = {'formation', 'well_position', 'well_cell'}
+
+PROGRESS_DIR = os.path.join(CACHE_DIR, 'progress')
+PROGRESS_POLL_INTERVAL = 0.2
+
+EXITED_ROW = 5
 
 
 class InitialParameters(BaseModel):
@@ -45,52 +54,231 @@ class InitialParameters(BaseModel):
     use_trapping: bool = False
     use_cap_fringe: bool = False
     well_position: Tuple[float, float] = None
+    well_cell: Optional[int] = None
+
+
+class EarlyStop:
+    def __init__(
+        self,
+        max_exited_fraction: float = 0.5
+    ) -> None:
+        self.max_exited_fraction = max_exited_fraction
+
+    def __call__(
+        self,
+        masses: np.array,
+        t: np.array
+    ) -> bool:
+        total = masses[:, -1].sum()
+        return total > 0 and masses[EXITED_ROW, -1] / total > self.max_exited_fraction
+
+    def key(self) -> Dict[str, any]:
+        return {'max_exited_fraction': self.max_exited_fraction}
 
 
 def explore_simulation(
     well_pos: Tuple[float, float],
     mongo_client: Optional[MongoDBClient] = None,
     eng=None,
+    engine_pool: Optional[OctaveEnginePool] = None,
+    cell_fields: Optional[List[str]] = None,
+    progress_file: Optional[str] = None,
+    early_stop: Optional[EarlyStop] = None,
+    cancel_token: Optional[CancellationToken] = None,
     **kwargs
 ) -> (np.array, np.array):
-    if not eng:
-        eng = oct2py.Oct2Py()
-        eng.addpath(eng.genpath('/home/jovyan/octave'))
-        eng.warning('off', 'all')
-
     initial_parameters = InitialParameters(**kwargs)
 
+    simulation_parameters = initial_parameters.dict(exclude=WELL_FIELDS)
+
     if mongo_client:
-        result = mongo_client.db.results.find_one({
-            'well_location': well_pos,
-            'simulation_parameters': initial_parameters.dict(exclude={'formation'})
-        })
+        initial_parameters.well_cell = get_cell_index(mongo_client, initial_parameters.formation).find_cell(well_pos)
+        key = get_result_key(initial_parameters.formation, initial_parameters.well_cell, simulation_parameters)
+
+        # Truncated runs are kept apart, so plain lookups only ever see complete results
+        truncated_key = early_stop and get_result_key(
+            initial_parameters.formation,
+            initial_parameters.well_cell,
+            {**simulation_parameters, 'early_stop': early_stop.key()}
+        )
+
+        # Only the inventory is cached, so runs asking for cell fields always simulate
+        result = None
+        if not cell_fields:
+            result = find_result(mongo_client.db, key) or (truncated_key and find_result(mongo_client.db, truncated_key))
 
         if result:
             return np.array(result['result']['masses']), np.array(result['result']['time'])
 
     initial_parameters.well_position = well_pos
 
-    masses_new, t, sol, w = eng.get_simulation_results(initial_parameters.dict(), nout=4)
+    params = initial_parameters.dict()
+    params['injection_key'] = get_injection_key(
+        initial_parameters.formation,
+        well_pos if initial_parameters.well_cell is None else initial_parameters.well_cell,
+        simulation_parameters
+    )
+    touch_injection_states(params['injection_key'])
+    own_progress_file = early_stop and not progress_file
+    if own_progress_file:
+        progress_file = create_progress_file()
+    if progress_file:
+        params['progress_file'] = progress_file
+
+    finished = threading.Event()
+    if early_stop:
+        threading.Thread(
+            target=_watch_progress,
+            args=(progress_file, early_stop, finished),
+            name='early_stop',
+            daemon=True
+        ).start()
+
+    nout = 3 if cell_fields else 2
+    try:
+        if eng:
+            outputs = eng.get_simulation_results_lean(params, cell_fields or [], nout=nout)
+        else:
+            with (engine_pool or get_engine_pool()).engine(cancel_token=cancel_token) as pooled_eng:
+                outputs = pooled_eng.get_simulation_results_lean(params, cell_fields or [], nout=nout)
+    finally:
+        finished.set()
+        if progress_file:
+            _remove_file(f'{progress_file}.stop')
+        if own_progress_file:
+            _remove_file(progress_file)
+        prune_injection_cache()
+
+    t_np = np.array(outputs[1]).flatten().astype(float)
+    masses_np = _convert_masses_to_mega(np.asarray(outputs[0], dtype=float))
+
+    truncated = is_truncated(t_np, initial_parameters)
+    if mongo_client and (truncated_key or not truncated):
+        _save_result(
+            mongo_client, truncated_key if truncated else key, initial_parameters, well_pos,
+            simulation_parameters, masses_np, t_np, truncated=truncated
+        )
 
-    _masses_np, t_np = _convert_to_np_arrays(masses_new, t)
-    masses_np = _convert_masses_to_mega(_masses_np)
+    if cell_fields:
+        return masses_np, t_np, _convert_cell_fields(outputs[2], cell_fields)
+    return masses_np, t_np
+
+
+def explore_simulations_batch(
+    well_positions: List[Tuple[float, float]],
+    mongo_client: Optional[MongoDBClient] = None,
+    eng=None,
+    engine_pool: Optional[OctaveEnginePool] = None,
+    well_cells: Optional[List[int]] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    **kwargs
+) -> (np.array, np.array):
+    initial_parameters = InitialParameters(**kwargs)
+
+    simulation_parameters = initial_parameters.dict(exclude=WELL_FIELDS)
+
+    masses: List[Optional[np.array]] = [None] * len(well_positions)
+    keys: List[Optional[str]] = [None] * len(well_positions)
+    t_np = None
+
+    if mongo_client and well_cells is None:
+        cell_index = get_cell_index(mongo_client, initial_parameters.formation)
+        well_cells = [cell_index.find_cell(well_pos) for well_pos in well_positions]
 
     if mongo_client:
-        result = {
-            'formation_id': FORMATIONS.index(initial_parameters.formation),
-            'well_location': well_pos,
-            'simulation_parameters': initial_parameters.dict(exclude={'formation', 'well_position'}),
-            'result': {'masses': masses_np.tolist(), 'time': t_np.tolist()}
-        }
+        for idx in range(len(well_positions)):
+            keys[idx] = get_result_key(initial_parameters.formation, well_cells[idx], simulation_parameters)
+
+            result = find_result(mongo_client.db, keys[idx])
+
+            if result:
+                masses[idx] = np.array(result['result']['masses'])
+                t_np = np.array(result['result']['time'])
+
+    missing = [idx for idx, well_masses in enumerate(masses) if well_masses is None]
+
+    if missing:
+        positions = np.array([well_positions[idx] for idx in missing], dtype=float)
+        cells = np.array([well_cells[idx] for idx in missing]) if well_cells is not None else np.zeros(0)
+        injection_keys = [
+            get_injection_key(
+                initial_parameters.formation,
+                well_positions[idx] if well_cells is None else well_cells[idx],
+                simulation_parameters
+            )
+            for idx in missing
+        ]
+        for injection_key in injection_keys:
+            touch_injection_states(injection_key)
 
         try:
-            result_id = mongo_client.db.results.insert_one(result).inserted_id
-            print(f'Result {result_id} is successfully saved')
-        except DuplicateKeyError:
-            print('The result is already saved')
+            if eng:
+                masses_new, t = eng.get_simulation_results_batch(
+                    initial_parameters.dict(), positions, cells, injection_keys, nout=2
+                )
+            else:
+                with (engine_pool or get_engine_pool()).engine(cancel_token=cancel_token) as pooled_eng:
+                    masses_new, t = pooled_eng.get_simulation_results_batch(
+                        initial_parameters.dict(), positions, cells, injection_keys, nout=2
+                    )
+        finally:
+            prune_injection_cache()
 
-    return masses_np, t_np
+        t_np = np.array(t).flatten().astype(float)
+        masses_batch = np.asarray(masses_new, dtype=float).reshape((len(missing), len(t_np), -1))
+
+        for batch_idx, idx in enumerate(missing):
+            masses[idx] = _convert_masses_to_mega(masses_batch[batch_idx])
+
+            if mongo_client:
+                initial_parameters.well_cell = well_cells[idx]
+                _save_result(
+                    mongo_client, keys[idx], initial_parameters, well_positions[idx],
+                    simulation_parameters, masses[idx], t_np
+                )
+
+    return np.stack(masses), t_np
+
+
+def get_setup_cache_stats(
+    eng=None,
+    engine_pool: Optional[OctaveEnginePool] = None
+) -> Dict[str, int]:
+    if eng:
+        stats = eng.setup_model_cache('stats')
+    else:
+        with (engine_pool or get_engine_pool()).engine() as pooled_eng:
+            stats = pooled_eng.setup_model_cache('stats')
+
+    return {name: int(value) for name, value in stats.items()}
+
+
+def _save_result(
+    mongo_client: MongoDBClient,
+    key: str,
+    initial_parameters: InitialParameters,
+    well_pos: Tuple[float, float],
+    simulation_parameters: Dict[str, any],
+    masses_np: np.array,
+    t_np: np.array,
+    truncated: bool = False
+) -> None:
+    result = {
+        'key': key,
+        'formation_id': FORMATIONS.index(initial_parameters.formation),
+        'well_cell': initial_parameters.well_cell,
+        'well_location': well_pos,
+        'simulation_parameters': simulation_parameters,
+        'result': {'masses': masses_np.tolist(), 'time': t_np.tolist()}
+    }
+    if truncated:
+        result['truncated'] = True
+
+    try:
+        result_id = mongo_client.db.results.insert_one(result).inserted_id
+        print(f'Result {result_id} is successfully saved')
+    except DuplicateKeyError:
+        print('The result is already saved')
 
 
 def _convert_masses_to_mega(
@@ -103,14 +291,71 @@ def _convert_masses_to_mega(
     return np.around(_masses_mega_transposed).astype(int)
 
 
-def _convert_to_np_arrays(
-    masses: np.array,
-    t: np.array
-) -> (np.array, np.array):
-    t_np = np.array(t).flatten().astype(float)
-    _masses_np = np.array(list(masses[0]))
-    masses_np = _masses_np.reshape((len(_masses_np), len(_masses_np[0, 0])))
-    return masses_np, t_np
+def is_truncated(
+    t: np.array,
+    initial_parameters: InitialParameters
+) -> bool:
+    return len(t) < initial_parameters.inj_steps + initial_parameters.mig_steps + 1
+
+
+def create_progress_file() -> str:
+    os.makedirs(PROGRESS_DIR, exist_ok=True)
+    fd, progress_file = tempfile.mkstemp(suffix='.csv', dir=PROGRESS_DIR)
+    os.close(fd)
+    return progress_file
+
+
+def read_progress_rows(
+    progress
+) -> List[List[float]]:
+    rows = []
+    while True:
+        position = progress.tell()
+        line = progress.readline()
+        # A line without its newline is still being written; read it again next time
+        if not line.endswith('\n'):
+            progress.seek(position)
+            return rows
+        rows.append([float(value) for value in line.split(',')])
+
+
+def convert_progress_rows(
+    rows: List[List[float]]
+) -> Tuple[np.array, np.array]:
+    rows = np.array(rows)
+    return _convert_masses_to_mega(rows[:, 2:]), rows[:, 1]
+
+
+def _watch_progress(
+    progress_file: str,
+    early_stop: EarlyStop,
+    finished: threading.Event
+) -> None:
+    with open(progress_file) as progress:
+        rows = []
+        while not finished.wait(PROGRESS_POLL_INTERVAL):
+            new_rows = read_progress_rows(progress)
+            if not new_rows:
+                continue
+            rows.extend(new_rows)
+            if early_stop(*convert_progress_rows(rows)):
+                # get_simulation_results stops after the step it is on when this file appears
+                open(f'{progress_file}.stop', 'w').close()
+                return
+
+
+def _remove_file(
+    path: str
+) -> None:
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def _convert_cell_fields(
+    fields: Dict[str, any],
+    cell_fields: List[str]
+) -> Dict[str, np.array]:
+    return {name: np.asarray(fields[name], dtype=np.float32).squeeze() for name in cell_fields}
 
 
 if __name__ == '__main__':
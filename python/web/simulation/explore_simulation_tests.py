@@ -0,0 +1,92 @@
+import unittest
+import os
+import time
+
+from explore_simulation import MEGA, EarlyStop, explore_simulation, explore_simulations_batch
+import numpy as np
+
+N_STEPS = 11
+N_FIELDS = 8
+N_CELLS = 5
+
+
+class FakeEngine:
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def get_simulation_results_batch(self, initial_params, well_positions, well_cells, injection_keys, nout=2):
+        self.calls += 1
+        masses = np.arange(len(well_positions), dtype=float)[:, None, None] * MEGA
+        masses = masses + np.zeros((len(well_positions), N_STEPS, N_FIELDS))
+        t = np.arange(N_STEPS, dtype=float)[None]
+        return masses, t
+
+    def get_simulation_results_lean(self, initial_params, cell_fields, nout=2):
+        self.calls += 1
+        masses = np.ones((N_STEPS, N_FIELDS)) * MEGA
+        t = np.arange(N_STEPS, dtype=float)[None]
+        fields = {name: np.zeros((N_CELLS, 1)) for name in cell_fields}
+        return (masses, t, fields)[:nout]
+
+
+class LeakingEngine:
+    def get_simulation_results_lean(self, initial_params, cell_fields, nout=2):
+        progress_file = initial_params['progress_file']
+        masses = []
+
+        for step in range(N_STEPS):
+            row = np.zeros(N_FIELDS)
+            row[1] = MEGA
+            row[-1] = step * MEGA
+            masses.append(row)
+            with open(progress_file, 'a') as progress:
+                progress.write(','.join(map(str, [step, step, *row])) + '\n')
+
+            time.sleep(0.5)
+            if os.path.exists(f'{progress_file}.stop'):
+                break
+
+        return np.array(masses), np.arange(len(masses), dtype=float)[None]
+
+
+class TestExploreSimulationsBatch(unittest.TestCase):
+    def test_wells_are_stacked_in_one_round_trip(self) -> None:
+        eng = FakeEngine()
+        masses, t = explore_simulations_batch([(0.0, 0.0), (1.0, 1.0), (2.0, 2.0)], eng=eng)
+
+        self.assertEqual(eng.calls, 1)
+        self.assertEqual(masses.shape, (3, N_FIELDS - 2, N_STEPS))
+        self.assertEqual(t.shape, (N_STEPS,))
+        np.testing.assert_array_equal(masses[:, 0, 0], [0, 1, 2])
+
+
+class TestExploreSimulation(unittest.TestCase):
+    def test_lean_result(self) -> None:
+        masses, t = explore_simulation((0.0, 0.0), eng=FakeEngine())
+
+        self.assertEqual(masses.shape, (N_FIELDS - 2, N_STEPS))
+        self.assertEqual(t.shape, (N_STEPS,))
+
+    def test_cell_fields_are_float32(self) -> None:
+        _, _, fields = explore_simulation((0.0, 0.0), eng=FakeEngine(), cell_fields=['h'])
+
+        self.assertEqual(fields['h'].dtype, np.float32)
+        self.assertEqual(fields['h'].shape, (N_CELLS,))
+
+
+class TestEarlyStop(unittest.TestCase):
+    def test_leaking_well_is_stopped_early(self) -> None:
+        masses, t = explore_simulation((0.0, 0.0), eng=LeakingEngine(), early_stop=EarlyStop(0.5))
+
+        self.assertLess(len(t), N_STEPS)
+        self.assertEqual(masses.shape, (N_FIELDS - 2, len(t)))
+
+    def test_predicate_uses_exited_fraction(self) -> None:
+        masses = np.array([[10, 10], [0, 0], [0, 0], [0, 0], [0, 0], [0, 11]])
+
+        self.assertFalse(EarlyStop(0.5)(masses[:, :1], np.zeros(1)))
+        self.assertTrue(EarlyStop(0.5)(masses, np.zeros(2)))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import os
+import threading
+import time
+from typing import Optional
+
+from python.web.simulation.trap_cache import CACHE_DIR
+
+# Shared with get_simulation_results.m, which saves the injection-phase states of every run here
+INJECTION_CACHE_DIR = os.path.join(CACHE_DIR, 'injection')
+INJECTION_CACHE_BYTES = int(os.environ.get('CO2SIM_INJECTION_CACHE_MB', 2048)) * 2 ** 20
+PRUNE_INTERVAL = 60
+# Left behind by runs killed mid-save
+STALE_TMP_AGE = 3600
+
+_last_pruned = 0.0
+_prune_lock = threading.Lock()
+
+
+def get_injection_states_path(
+    key: str,
+    cache_dir: str = INJECTION_CACHE_DIR
+) -> str:
+    return os.path.join(cache_dir, f'{key}.mat')
+
+
+def touch_injection_states(
+    key: str,
+    cache_dir: str = INJECTION_CACHE_DIR
+) -> None:
+    # Octave only reads the file, so its use is recorded here for the LRU order
+    try:
+        os.utime(get_injection_states_path(key, cache_dir))
+    except FileNotFoundError:
+        pass
+
+
+def prune_injection_cache(
+    max_bytes: int = INJECTION_CACHE_BYTES,
+    cache_dir: str = INJECTION_CACHE_DIR,
+    interval: Optional[float] = PRUNE_INTERVAL
+) -> int:
+    global _last_pruned
+
+    with _prune_lock:
+        if interval and time.monotonic() - _last_pruned < interval:
+            return 0
+        _last_pruned = time.monotonic()
+
+    try:
+        entries = list(os.scandir(cache_dir))
+    except FileNotFoundError:
+        return 0
+
+    now = time.time()
+    states = []
+    removed = 0
+    for entry in entries:
+        try:
+            stat = entry.stat()
+        except FileNotFoundError:
+            continue
+        if entry.name.endswith('.mat'):
+            states.append((stat.st_mtime, stat.st_size, entry.path))
+        elif entry.name.endswith('.tmp') and now - stat.st_mtime > STALE_TMP_AGE:
+            removed += _remove(entry.path)
+
+    total = sum(size for _, size, _ in states)
+    for _, size, path in sorted(states):
+        if total <= max_bytes:
+            break
+        removed += _remove(path)
+        total -= size
+
+    return removed
+
+
+def _remove(
+    path: str
+) -> int:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        return 0
+    return 1
@@ -0,0 +1,37 @@
+import os
+import tempfile
+import time
+import unittest
+from injection_cache import get_injection_states_path, prune_injection_cache, touch_injection_states
+
+
+class TestInjectionCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+
+        now = time.time()
+        for age, key in enumerate(['newest', 'middle', 'oldest']):
+            path = get_injection_states_path(key, self.cache_dir.name)
+            with open(path, 'wb') as f:
+                f.write(b'0' * 100)
+            os.utime(path, (now - age * 60, now - age * 60))
+
+    def _keys(self) -> set:
+        return {name[:-len('.mat')] for name in os.listdir(self.cache_dir.name)}
+
+    def test_least_recently_used_states_are_removed(self) -> None:
+        removed = prune_injection_cache(max_bytes=200, cache_dir=self.cache_dir.name, interval=None)
+
+        self.assertEqual(removed, 1)
+        self.assertEqual(self._keys(), {'newest', 'middle'})
+
+    def test_touched_states_are_kept(self) -> None:
+        touch_injection_states('oldest', self.cache_dir.name)
+        prune_injection_cache(max_bytes=100, cache_dir=self.cache_dir.name, interval=None)
+
+        self.assertEqual(self._keys(), {'oldest'})
+
+    def test_cache_under_the_cap_is_left_alone(self) -> None:
+        self.assertEqual(prune_injection_cache(max_bytes=300, cache_dir=self.cache_dir.name, interval=None), 0)
+        self.assertEqual(len(self._keys()), 3)
@@ -0,0 +1,163 @@
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from python.db_client.mongo_client import MongoDBClient
+from python.web.session_store import SessionStore
+from python.web.simulation.engine_pool import create_engine, is_engine_alive
+from python.web.simulation.explore_simulation import InitialParameters
+from python.web.simulation.streaming import stream_simulation
+
+SIMULATION_WORKERS = int(os.environ.get('SIMULATION_WORKERS', 2))
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+_worker_engine = None
+_worker_mongo_client = None
+_worker_progress = None
+
+
+class SimulationJobQueue:
+    def __init__(
+        self,
+        store: SessionStore,
+        workers: int = SIMULATION_WORKERS
+    ) -> None:
+        # Job state lives in the shared store, so any app worker can answer a poll for it
+        self.store = store
+        self.workers = workers
+        context = multiprocessing.get_context('spawn')
+        self._progress = context.Queue()
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self._progress,)
+        )
+
+    def start(self) -> None:
+        # Spawned workers re-import the launching module; they must not start workers of their own
+        if multiprocessing.parent_process() is not None:
+            return
+        threading.Thread(target=self._drain_progress, name='simulation_job_progress', daemon=True).start()
+        for _ in range(self.workers):
+            self._executor.submit(_warm_up_worker)
+
+    def submit(
+        self,
+        well_pos: Tuple[float, float],
+        **simulation_parameters
+    ) -> str:
+        job_id = uuid.uuid4().hex
+        self.store.update(_job_key(job_id), {'status': QUEUED, 'progress': 0.0, 'submitted': time.time()})
+        future = self._executor.submit(_run_job, job_id, well_pos, simulation_parameters)
+        future.add_done_callback(partial(self._record_outcome, job_id))
+        return job_id
+
+    def status(
+        self,
+        job_id: str
+    ) -> Optional[Dict[str, any]]:
+        key = _job_key(job_id)
+        status = self.store.get(key, 'status')
+        if status is None:
+            return None
+        if status == QUEUED and self.store.get(key, 'started', False):
+            status = RUNNING
+
+        return {
+            'id': job_id,
+            'status': status,
+            'progress': 1.0 if status == DONE else self.store.get(key, 'progress', 0.0),
+            'partial': self.store.get(key, 'partial'),
+            'result': self.store.get(key, 'result'),
+            'error': self.store.get(key, 'error')
+        }
+
+    def forget(
+        self,
+        job_id: str
+    ) -> None:
+        self.store.delete(_job_key(job_id))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+    def _drain_progress(self) -> None:
+        while True:
+            try:
+                job_id, progress, partial = self._progress.get()
+            except (EOFError, OSError):
+                return
+            values = {'started': True, 'progress': progress}
+            if partial:
+                values['partial'] = partial
+            self.store.update(_job_key(job_id), values)
+
+    def _record_outcome(
+        self,
+        job_id: str,
+        future: Future
+    ) -> None:
+        error = future.exception()
+        if error:
+            self.store.update(_job_key(job_id), {'status': FAILED, 'error': str(error)})
+        else:
+            masses, t = future.result()
+            self.store.update(_job_key(job_id), {'status': DONE, 'result': {'masses': masses, 'time': t}})
+
+
+def _job_key(
+    job_id: str
+) -> str:
+    return f'job:{job_id}'
+
+
+def _init_worker(
+    progress: multiprocessing.Queue
+) -> None:
+    global _worker_progress
+    _worker_progress = progress
+
+
+def _warm_up_worker() -> None:
+    global _worker_engine
+    global _worker_mongo_client
+
+    if _worker_engine is None or not is_engine_alive(_worker_engine):
+        _worker_engine = create_engine()
+    if _worker_mongo_client is None:
+        _worker_mongo_client = MongoDBClient('co2sim')
+
+
+def _run_job(
+    job_id: str,
+    well_pos: Tuple[float, float],
+    simulation_parameters: Dict[str, any]
+) -> Tuple[np.array, np.array]:
+    _worker_progress.put((job_id, 0.0, None))
+    _warm_up_worker()
+
+    initial_parameters = InitialParameters(**simulation_parameters)
+    steps = initial_parameters.inj_steps + initial_parameters.mig_steps
+
+    for masses, t in stream_simulation(
+        well_pos,
+        mongo_client=_worker_mongo_client,
+        eng=_worker_engine,
+        **simulation_parameters
+    ):
+        _worker_progress.put((job_id, (len(t) - 1) / steps, {'masses': masses, 'time': t}))
+
+    _worker_progress.put((job_id, 1.0, None))
+    return masses, t
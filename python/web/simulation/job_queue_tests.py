@@ -0,0 +1,53 @@
+import unittest
+from concurrent.futures import Future
+
+import numpy as np
+
+from job_queue import DONE, FAILED, QUEUED, RUNNING, SimulationJobQueue, _job_key
+from python.web.session_store import InMemorySessionStore
+
+
+class TestSimulationJobQueue(unittest.TestCase):
+    def setUp(self) -> None:
+        self.store = InMemorySessionStore()
+        # Two app workers sharing one store; only the first one ran the job
+        self.submitter = SimulationJobQueue(self.store, workers=1)
+        self.other = SimulationJobQueue(self.store, workers=1)
+        self.store.update(_job_key('job'), {'status': QUEUED, 'progress': 0.0})
+
+    def tearDown(self) -> None:
+        self.submitter.close()
+        self.other.close()
+
+    def test_progress_is_visible_to_other_workers(self) -> None:
+        self.assertEqual(self.other.status('job')['status'], QUEUED)
+
+        self.store.update(_job_key('job'), {'started': True, 'progress': 0.5})
+        status = self.other.status('job')
+        self.assertEqual(status['status'], RUNNING)
+        self.assertEqual(status['progress'], 0.5)
+
+    def test_result_is_visible_to_other_workers(self) -> None:
+        future = Future()
+        future.set_result((np.ones((6, 3)), np.arange(3)))
+        self.submitter._record_outcome('job', future)
+
+        status = self.other.status('job')
+        self.assertEqual(status['status'], DONE)
+        self.assertEqual(status['progress'], 1.0)
+        np.testing.assert_array_equal(status['result']['masses'], np.ones((6, 3)))
+
+        self.other.forget('job')
+        self.assertIsNone(self.submitter.status('job'))
+
+    def test_failure_is_visible_to_other_workers(self) -> None:
+        future = Future()
+        future.set_exception(RuntimeError('engine crashed'))
+        self.submitter._record_outcome('job', future)
+
+        status = self.other.status('job')
+        self.assertEqual(status['status'], FAILED)
+        self.assertEqual(status['error'], 'engine crashed')
+
+    def test_unknown_job(self) -> None:
+        self.assertIsNone(self.other.status('missing'))
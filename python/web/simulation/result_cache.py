@@ -0,0 +1,79 @@
+import hashlib
+import json
+from typing import Dict, Optional
+
+from pymongo import ASCENDING
+from pymongo.database import Database
+
+SIGNIFICANT_DIGITS = 10
+
+# Settings that only affect the migration phase; the injection phase can be reused across them
+MIGRATION_FIELDS = {'mig_time', 'mig_steps'}
+
+_indexed_databases = set()
+
+
+def get_result_key(
+    formation: str,
+    well: any,
+    simulation_parameters: Dict[str, any]
+) -> str:
+    payload = {
+        'formation': formation.lower(),
+        'well': _normalize(well),
+        'simulation_parameters': _normalize(simulation_parameters)
+    }
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def get_injection_key(
+    formation: str,
+    well: any,
+    simulation_parameters: Dict[str, any]
+) -> str:
+    injection_parameters = {
+        name: value
+        for name, value in simulation_parameters.items()
+        if name not in MIGRATION_FIELDS
+    }
+    return get_result_key(formation, well, {'injection': injection_parameters})
+
+
+def ensure_result_indexes(
+    db: Database
+) -> None:
+    if db.name in _indexed_databases:
+        return
+
+    db.results.create_index(
+        [('key', ASCENDING)],
+        name='key_unique',
+        unique=True,
+        partialFilterExpression={'key': {'$exists': True}}
+    )
+    _indexed_databases.add(db.name)
+
+
+def find_result(
+    db: Database,
+    key: str
+) -> Optional[Dict[str, any]]:
+    ensure_result_indexes(db)
+    return db.results.find_one({'key': key}, {'result': 1})
+
+
+def _normalize(
+    value: any
+) -> any:
+    if isinstance(value, bool) or value is None or isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)):
+        return float(f'{float(value):.{SIGNIFICANT_DIGITS}g}')
+    if isinstance(value, dict):
+        return {str(k): _normalize(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_normalize(v) for v in value]
+    if hasattr(value, 'tolist'):
+        return _normalize(value.tolist())
+    raise TypeError(f'Cannot build a result key from {type(value).__name__}')
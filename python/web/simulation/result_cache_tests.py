@@ -0,0 +1,42 @@
+import unittest
+from result_cache import get_injection_key, get_result_key
+
+PARAMETERS = {'inj_steps': 5.0, 'inj_time': 1577846600.0, 'pv_mult': 1e-10, 'use_trapping': False}
+
+
+class TestResultKey(unittest.TestCase):
+    def test_key_ignores_field_order_and_number_types(self) -> None:
+        reordered = {'use_trapping': False, 'pv_mult': 1e-10, 'inj_time': 1577846600.0 + 1e-7, 'inj_steps': 5}
+
+        self.assertEqual(
+            get_result_key('Utsirafm', (487000.0, 6721000.0), PARAMETERS),
+            get_result_key('Utsirafm', [487000, 6721000], reordered)
+        )
+
+    def test_key_depends_on_formation(self) -> None:
+        self.assertNotEqual(
+            get_result_key('Utsirafm', (487000.0, 6721000.0), PARAMETERS),
+            get_result_key('Stofm', (487000.0, 6721000.0), PARAMETERS)
+        )
+
+    def test_key_keeps_small_parameters_apart(self) -> None:
+        self.assertNotEqual(
+            get_result_key('Utsirafm', (487000.0, 6721000.0), PARAMETERS),
+            get_result_key('Utsirafm', (487000.0, 6721000.0), {**PARAMETERS, 'pv_mult': 2e-10})
+        )
+
+
+class TestInjectionKey(unittest.TestCase):
+    def test_key_ignores_migration_settings(self) -> None:
+        longer_migration = {**PARAMETERS, 'mig_time': 2e10, 'mig_steps': 20.0}
+
+        self.assertEqual(
+            get_injection_key('Utsirafm', 1234, {**PARAMETERS, 'mig_time': 1e10, 'mig_steps': 5.0}),
+            get_injection_key('Utsirafm', 1234, longer_migration)
+        )
+
+    def test_key_depends_on_injection_settings(self) -> None:
+        self.assertNotEqual(
+            get_injection_key('Utsirafm', 1234, PARAMETERS),
+            get_injection_key('Utsirafm', 1234, {**PARAMETERS, 'inj_steps': 10.0})
+        )
@@ -0,0 +1,58 @@
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, Tuple
+
+import numpy as np
+
+from python.web.simulation.explore_simulation import (
+    PROGRESS_POLL_INTERVAL,
+    convert_progress_rows,
+    create_progress_file,
+    explore_simulation,
+    read_progress_rows
+)
+
+
+def stream_simulation(
+    well_pos: Tuple[float, float],
+    **kwargs
+) -> Iterator[Tuple[np.array, np.array]]:
+    progress_file = create_progress_file()
+
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='stream_simulation')
+    future = executor.submit(explore_simulation, well_pos, progress_file=progress_file, **kwargs)
+
+    try:
+        with open(progress_file) as progress:
+            rows = []
+            while True:
+                finished = future.done()
+                new_rows = read_progress_rows(progress)
+                if new_rows:
+                    rows.extend(new_rows)
+                    yield convert_progress_rows(rows)
+                if finished:
+                    break
+                time.sleep(PROGRESS_POLL_INTERVAL)
+
+        masses, t = future.result()[:2]
+        if len(rows) != len(t):
+            yield masses, t
+    finally:
+        if not future.done():
+            # The caller gave up on this run: get_simulation_results stops after the step it is on,
+            # and the files go once it has returned, since until then it keeps appending to them
+            open(f'{progress_file}.stop', 'w').close()
+        future.add_done_callback(lambda _: _remove_progress_files(progress_file))
+        executor.shutdown(wait=False)
+
+
+def _remove_progress_files(
+    progress_file: str
+) -> None:
+    for path in (progress_file, f'{progress_file}.stop'):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
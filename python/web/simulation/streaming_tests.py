@@ -0,0 +1,84 @@
+import os
+import tempfile
+import time
+import unittest
+from streaming import stream_simulation
+import numpy as np
+
+from explore_simulation import MEGA, read_progress_rows
+
+N_STEPS = 4
+N_FIELDS = 8
+
+
+class StreamingEngine:
+    def get_simulation_results_lean(self, initial_params, cell_fields, nout=2):
+        masses = np.arange(N_STEPS + 1, dtype=float)[:, None] * MEGA + np.zeros((N_STEPS + 1, N_FIELDS))
+        t = np.arange(N_STEPS + 1, dtype=float)
+
+        for step in range(N_STEPS + 1):
+            with open(initial_params['progress_file'], 'a') as progress:
+                progress.write(','.join(map(str, [step, t[step], *masses[step]])) + '\n')
+            time.sleep(0.3)
+
+        return masses, t[None]
+
+
+class StoppableEngine(StreamingEngine):
+    def __init__(self) -> None:
+        self.steps = 0
+
+    def get_simulation_results_lean(self, initial_params, cell_fields, nout=2):
+        progress_file = self.progress_file = initial_params['progress_file']
+        for step in range(N_STEPS + 1):
+            with open(progress_file, 'a') as progress:
+                progress.write(','.join(map(str, [step, step, *[step * MEGA] * N_FIELDS])) + '\n')
+            self.steps += 1
+            if os.path.exists(f'{progress_file}.stop'):
+                break
+            time.sleep(0.3)
+
+        t = np.arange(self.steps, dtype=float)
+        return np.zeros((self.steps, N_FIELDS)), t[None]
+
+
+class TestStreaming(unittest.TestCase):
+    def test_partial_curves_grow_until_the_full_result(self) -> None:
+        curves = list(stream_simulation((0.0, 0.0), eng=StreamingEngine()))
+
+        self.assertGreater(len(curves), 1)
+        lengths = [len(t) for _, t in curves]
+        self.assertEqual(lengths, sorted(lengths))
+        masses, t = curves[-1]
+        self.assertEqual(masses.shape, (N_FIELDS - 2, N_STEPS + 1))
+        np.testing.assert_array_equal(masses[0], np.arange(N_STEPS + 1))
+
+    def test_closing_the_stream_stops_the_run(self) -> None:
+        engine = StoppableEngine()
+        curves = stream_simulation((0.0, 0.0), eng=engine)
+        next(curves)
+        curves.close()
+        progress_file = engine.progress_file
+
+        deadline = time.monotonic() + 5
+        while os.path.exists(progress_file) and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+        self.assertLess(engine.steps, N_STEPS + 1)
+        self.assertFalse(os.path.exists(progress_file))
+        self.assertFalse(os.path.exists(f'{progress_file}.stop'))
+
+    def test_unfinished_line_is_left_for_later(self) -> None:
+        with tempfile.TemporaryFile('w+') as progress:
+            progress.write('0,0,1\n1,10,2')
+            progress.seek(0)
+            self.assertEqual(read_progress_rows(progress), [[0.0, 0.0, 1.0]])
+
+            progress.seek(0, 2)
+            progress.write('\n')
+            progress.seek(len('0,0,1\n'))
+            self.assertEqual(read_progress_rows(progress), [[1.0, 10.0, 2.0]])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from python.db_client.formations import FORMATIONS
+from python.db_client.mongo_client import MongoDBClient
+from python.web.simulation.cell_index import FormationCellIndex, get_cell_index
+from python.web.simulation.explore_simulation import WELL_FIELDS, InitialParameters
+from python.web.simulation.trap_cache import load_trap_cells
+
+SURROGATE_MEMBERS = 8
+SURROGATE_ALPHA = 1.0
+SURROGATE_MIN_RESULTS = int(os.environ.get('SURROGATE_MIN_RESULTS', 50))
+SURROGATE_MAX_RESULTS = 20000
+# Refitting is worth it once the stored results grow by a fifth
+SURROGATE_REFIT_GROWTH = 1.2
+
+INVENTORY_ROWS = 6
+
+# Injection and fluid parameters that vary between stored results
+PARAMETER_FEATURES = [
+    'default_rate', 'inj_time', 'mig_time', 'water_residual', 'co2_residual', 'c', 'rho_cref', 'temp_gradient'
+]
+
+
+class SurrogateEnsemble:
+    def __init__(
+        self,
+        members: int = SURROGATE_MEMBERS,
+        alpha: float = SURROGATE_ALPHA,
+        seed: Optional[int] = None
+    ) -> None:
+        self.members = members
+        self.alpha = alpha
+        self._rng = np.random.default_rng(seed)
+        self._weights: List[np.array] = []
+        self._x_mean = None
+        self._x_std = None
+        self._y_mean = None
+
+    def fit(
+        self,
+        features: np.array,
+        targets: np.array
+    ) -> 'SurrogateEnsemble':
+        self._x_mean = features.mean(axis=0)
+        self._x_std = features.std(axis=0)
+        self._x_std[self._x_std == 0] = 1
+        self._y_mean = targets.mean(axis=0)
+
+        x = (features - self._x_mean) / self._x_std
+        y = targets - self._y_mean
+        regularization = self.alpha * np.eye(x.shape[1])
+
+        self._weights = []
+        for _ in range(self.members):
+            sample = self._rng.integers(0, len(x), len(x))
+            x_sample, y_sample = x[sample], y[sample]
+            self._weights.append(np.linalg.solve(x_sample.T @ x_sample + regularization, x_sample.T @ y_sample))
+
+        return self
+
+    def predict(
+        self,
+        features: np.array
+    ) -> np.array:
+        x = (features - self._x_mean) / self._x_std
+        return np.stack([x @ weights + self._y_mean for weights in self._weights])
+
+
+class RewardSurrogate:
+    def __init__(
+        self,
+        ensemble: SurrogateEnsemble,
+        cell_index: FormationCellIndex,
+        traps: Optional[np.array],
+        simulation_parameters: Dict[str, any],
+        inventory_shape: Tuple[int, int],
+        results_count: int
+    ) -> None:
+        self.ensemble = ensemble
+        self.cell_index = cell_index
+        self.traps = traps
+        self.simulation_parameters = simulation_parameters
+        self.inventory_shape = inventory_shape
+        self.results_count = results_count
+
+    def predict_masses(
+        self,
+        well_positions: List[Tuple[float, float]]
+    ) -> np.array:
+        cells = [self.cell_index.find_cell(well_pos) for well_pos in well_positions]
+        features = get_features(self.cell_index, self.traps, cells, [self.simulation_parameters] * len(cells))
+        predictions = self.ensemble.predict(features)
+        return predictions.reshape((self.ensemble.members, len(cells)) + self.inventory_shape)
+
+
+def get_features(
+    cell_index: FormationCellIndex,
+    traps: Optional[np.array],
+    cells: List[int],
+    simulation_parameters: List[Dict[str, any]]
+) -> np.array:
+    cells = np.asarray(cells, dtype=int)
+    x, y = cell_index.centroids[cells].T
+    depths = cell_index.depths[cells]
+    in_trap = (traps[cells] > 0).astype(float) if traps is not None else np.zeros(len(cells))
+    parameters = np.array([[params[name] for name in PARAMETER_FEATURES] for params in simulation_parameters])
+
+    return np.column_stack([depths, x, y, x * x, y * y, x * y, depths * in_trap, in_trap, parameters])
+
+
+def fit_surrogate(
+    mongo_client: MongoDBClient,
+    min_results: int = SURROGATE_MIN_RESULTS,
+    seed: Optional[int] = None,
+    **kwargs
+) -> Optional[RewardSurrogate]:
+    initial_parameters = InitialParameters(**kwargs)
+    formation = initial_parameters.formation
+    simulation_parameters = initial_parameters.dict(exclude=WELL_FIELDS)
+    inventory_shape = (INVENTORY_ROWS, int(initial_parameters.inj_steps + initial_parameters.mig_steps) + 1)
+
+    results = mongo_client.db.results.find(
+        _get_results_filter(formation),
+        {'well_cell': 1, 'simulation_parameters': 1, 'result.masses': 1},
+        sort=[('_id', -1)],
+        limit=SURROGATE_MAX_RESULTS
+    )
+
+    cells = []
+    parameters = []
+    targets = []
+    for result in results:
+        masses = np.array(result['result']['masses'], dtype=float)
+        if masses.shape != inventory_shape:
+            continue
+        cells.append(result['well_cell'])
+        parameters.append({**simulation_parameters, **result['simulation_parameters']})
+        targets.append(masses.flatten())
+
+    if len(targets) < min_results:
+        return None
+
+    cell_index = get_cell_index(mongo_client, formation)
+    traps = load_trap_cells(formation)
+    ensemble = SurrogateEnsemble(seed=seed).fit(
+        get_features(cell_index, traps, cells, parameters),
+        np.array(targets)
+    )
+
+    print(f'Surrogate for {formation} is fitted on {len(targets)} results')
+    return RewardSurrogate(ensemble, cell_index, traps, simulation_parameters, inventory_shape, len(targets))
+
+
+def refit_surrogate(
+    mongo_client: MongoDBClient,
+    surrogate: Optional[RewardSurrogate],
+    results_count: int,
+    **kwargs
+) -> (Optional[RewardSurrogate], int):
+    formation = InitialParameters(**kwargs).formation
+    current_count = count_surrogate_results(mongo_client, formation)
+    if current_count < max(results_count * SURROGATE_REFIT_GROWTH, SURROGATE_MIN_RESULTS):
+        return surrogate, results_count
+
+    return fit_surrogate(mongo_client, **kwargs) or surrogate, current_count
+
+
+def count_surrogate_results(
+    mongo_client: MongoDBClient,
+    formation: str
+) -> int:
+    return mongo_client.db.results.count_documents(_get_results_filter(formation))
+
+
+def _get_results_filter(
+    formation: str
+) -> Dict[str, any]:
+    return {'formation_id': FORMATIONS.index(formation), 'well_cell': {'$exists': True}}
@@ -0,0 +1,42 @@
+import unittest
+from cell_index import FormationCellIndex
+from surrogate import PARAMETER_FEATURES, RewardSurrogate, SurrogateEnsemble, get_features
+import numpy as np
+
+CENTROIDS = np.array([[1000, 1000], [3000, 1000], [1000, 3000], [3000, 3000]], dtype=float)
+DEPTHS = np.array([800.0, 900.0, 1000.0, 1100.0])
+PARAMETERS = {name: 1.0 for name in PARAMETER_FEATURES}
+
+
+class TestSurrogate(unittest.TestCase):
+    def test_ensemble_fits_linear_targets(self) -> None:
+        rng = np.random.default_rng(0)
+        features = rng.normal(size=(200, 3))
+        targets = features @ np.array([[1.0, -2.0], [0.5, 0.0], [0.0, 3.0]]) + 4
+
+        predictions = SurrogateEnsemble(alpha=1e-6, seed=0).fit(features, targets).predict(features[:5])
+
+        self.assertEqual(predictions.shape, (SurrogateEnsemble().members, 5, 2))
+        np.testing.assert_allclose(predictions.mean(axis=0), targets[:5], atol=1e-3)
+
+    def test_features_mark_trap_cells(self) -> None:
+        cell_index = FormationCellIndex(CENTROIDS, DEPTHS)
+        features = get_features(cell_index, np.array([0, 2, 0, 1]), [0, 1], [PARAMETERS] * 2)
+
+        self.assertEqual(features.shape, (2, 8 + len(PARAMETER_FEATURES)))
+        np.testing.assert_array_equal(features[:, 7], [0, 1])
+
+    def test_masses_are_predicted_per_member(self) -> None:
+        cell_index = FormationCellIndex(CENTROIDS, DEPTHS)
+        features = get_features(cell_index, None, [0, 1, 2, 3], [PARAMETERS] * 4)
+        ensemble = SurrogateEnsemble(seed=0).fit(features, np.ones((4, 6 * 11)))
+        surrogate = RewardSurrogate(ensemble, cell_index, None, PARAMETERS, (6, 11), 4)
+
+        masses = surrogate.predict_masses([(1000.0, 1000.0), (3000.0, 3000.0)])
+
+        self.assertEqual(masses.shape, (ensemble.members, 2, 6, 11))
+        np.testing.assert_allclose(masses, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
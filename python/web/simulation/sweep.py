@@ -0,0 +1,272 @@
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from pymongo.database import Database
+
+from python.db_client.formations import FORMATIONS
+from python.db_client.mongo_client import MongoDBClient
+from python.web.reinforcement_learning.rewards import get_rewards
+from python.web.simulation.cell_index import get_cell_index
+from python.web.simulation.engine_pool import CancellationToken, OctaveEnginePool, SimulationCancelled, get_engine_pool
+from python.web.simulation.explore_simulation import WELL_FIELDS, InitialParameters, explore_simulations_batch
+from python.web.simulation.result_cache import find_result, get_result_key
+
+SWEEP_CHUNK_SIZE = 8
+STOP_POLL_INTERVAL = 1
+RASTER_RESOLUTION = 2000
+SWEEP_LOOKUP_DISTANCE = RASTER_RESOLUTION / 2
+
+
+def get_sweep_key(
+    formation: str,
+    stride: int,
+    simulation_parameters: Dict[str, any]
+) -> str:
+    return get_result_key(formation, f'sweep:{stride}', simulation_parameters)
+
+
+def get_sweep_cells(
+    cells_count: int,
+    stride: int = 1
+) -> List[int]:
+    return list(range(0, cells_count, stride))
+
+
+def run_sweep(
+    mongo_client: MongoDBClient,
+    formation: str,
+    stride: int = 1,
+    engine_pool: Optional[OctaveEnginePool] = None,
+    stop_sweep: Optional[any] = None,
+    cancel_token: Optional[CancellationToken] = None,
+    **kwargs
+) -> Optional[Dict[str, any]]:
+    simulation_parameters = InitialParameters(formation=formation, **kwargs).dict(exclude=WELL_FIELDS)
+    cell_index = get_cell_index(mongo_client, formation)
+    sweep = _load_or_create_sweep(mongo_client.db, formation, stride, len(cell_index.centroids), simulation_parameters)
+
+    pending = [idx for idx, reward in enumerate(sweep['rewards']) if reward is None]
+    print(f"Sweep {sweep['_id']}: {len(sweep['cells']) - len(pending)}/{len(sweep['cells'])} cells done")
+
+    if cancel_token is None:
+        cancel_token = CancellationToken(stop_sweep)
+    engine_pool = engine_pool or get_engine_pool()
+    executor = ThreadPoolExecutor(max_workers=engine_pool.size, thread_name_prefix='sweep')
+
+    futures: Dict[Future, List[int]] = {}
+    for start in range(0, len(pending), SWEEP_CHUNK_SIZE):
+        chunk = pending[start:start + SWEEP_CHUNK_SIZE]
+        cells = [sweep['cells'][idx] for idx in chunk]
+        futures[executor.submit(
+            explore_simulations_batch,
+            [tuple(cell_index.centroids[cell]) for cell in cells],
+            mongo_client=mongo_client,
+            engine_pool=engine_pool,
+            well_cells=cells,
+            cancel_token=cancel_token,
+            formation=formation,
+            **simulation_parameters
+        )] = chunk
+
+    try:
+        not_done = set(futures)
+        while not_done:
+            done, not_done = wait(not_done, timeout=STOP_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk = futures[future]
+                try:
+                    masses, _ = future.result()
+                except SimulationCancelled:
+                    continue
+                except Exception as error:
+                    # The chunk's rewards stay pending, so resuming the sweep retries it
+                    print(f"Sweep {sweep['_id']}: cells {[sweep['cells'][idx] for idx in chunk]} failed: {error!r}")
+                    _record_failure(mongo_client.db, sweep, chunk)
+                    continue
+                rewards = get_rewards(dict(enumerate(masses)))
+                _checkpoint(mongo_client.db, sweep, chunk, rewards)
+
+            if cancel_token:
+                return None
+    finally:
+        # Chunks still queued or running would otherwise keep the shared engines busy
+        cancel_token.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    if sweep.get('failed'):
+        print(f"Sweep {sweep['_id']}: {len(sweep['failed'])} cells failed, run it again to retry them")
+        return sweep
+
+    mongo_client.db.sweeps.update_one({'_id': sweep['_id']}, {'$set': {'complete': True}})
+    sweep['complete'] = True
+    return sweep
+
+
+def find_sweep(
+    mongo_client: MongoDBClient,
+    formation: str,
+    stride: int = 1,
+    **kwargs
+) -> Optional[Dict[str, any]]:
+    simulation_parameters = InitialParameters(formation=formation, **kwargs).dict(exclude=WELL_FIELDS)
+    return mongo_client.db.sweeps.find_one({'_id': get_sweep_key(formation, stride, simulation_parameters)})
+
+
+def find_latest_sweep(
+    mongo_client: MongoDBClient,
+    formation: str
+) -> Optional[Dict[str, any]]:
+    return mongo_client.db.sweeps.find_one(
+        {'formation_id': FORMATIONS.index(formation)},
+        sort=[('complete', -1), ('updated', -1)]
+    )
+
+
+def find_parameter_sweep(
+    mongo_client: MongoDBClient,
+    formation: str,
+    **kwargs
+) -> Optional[Dict[str, any]]:
+    simulation_parameters = InitialParameters(formation=formation, **kwargs).dict(exclude=WELL_FIELDS)
+    # Any stride answers lookups; a complete sweep and then the densest one is preferred
+    return mongo_client.db.sweeps.find_one(
+        {'formation_id': FORMATIONS.index(formation), 'simulation_parameters': simulation_parameters},
+        sort=[('complete', -1), ('stride', 1)]
+    )
+
+
+def lookup_result(
+    mongo_client: MongoDBClient,
+    sweep: Dict[str, any],
+    well_pos: Tuple[float, float],
+    max_distance: float = SWEEP_LOOKUP_DISTANCE
+) -> Optional[Tuple[np.array, np.array]]:
+    formation = FORMATIONS[sweep['formation_id']]
+    idx = get_closest_swept(get_cell_index(mongo_client, formation).centroids, sweep, well_pos, max_distance)
+    if idx is None:
+        return None
+
+    key = get_result_key(formation, sweep['cells'][idx], sweep['simulation_parameters'])
+    result = find_result(mongo_client.db, key)
+    if not result:
+        return None
+    return np.array(result['result']['masses']), np.array(result['result']['time'])
+
+
+def get_closest_swept(
+    centroids: np.array,
+    sweep: Dict[str, any],
+    well_pos: Tuple[float, float],
+    max_distance: float = SWEEP_LOOKUP_DISTANCE
+) -> Optional[int]:
+    # Strided sweeps don't cover every cell, so a query is answered by the closest swept one nearby
+    distances = np.sqrt(((centroids[sweep['cells']] - np.asarray(well_pos)) ** 2).sum(axis=1))
+    idx = int(np.argmin(distances))
+    if distances[idx] > max_distance or sweep['rewards'][idx] is None:
+        return None
+    return idx
+
+
+def get_best_cells(
+    sweep: Dict[str, any],
+    count: int = 5
+) -> List[Tuple[int, float]]:
+    rewards = np.array([np.nan if reward is None else reward for reward in sweep['rewards']], dtype=float)
+    order = np.argsort(np.where(np.isnan(rewards), -np.inf, rewards))[::-1][:count]
+    return [(sweep['cells'][idx], float(rewards[idx])) for idx in order if not np.isnan(rewards[idx])]
+
+
+def get_reward_raster(
+    centroids: np.array,
+    sweep: Dict[str, any],
+    resolution: float = RASTER_RESOLUTION
+) -> (np.array, np.array, np.array):
+    cells = np.array(sweep['cells'])
+    rewards = np.array([np.nan if reward is None else reward for reward in sweep['rewards']], dtype=float)
+    points = centroids[cells]
+
+    origin = centroids.min(axis=0)
+    shape = np.floor((centroids.max(axis=0) - origin) / resolution).astype(int) + 1
+    columns, rows = np.floor((points - origin) / resolution).astype(int).T
+
+    raster = np.full((shape[1], shape[0]), -np.inf)
+    np.fmax.at(raster, (rows, columns), np.where(np.isnan(rewards), -np.inf, rewards))
+    raster[np.isneginf(raster)] = np.nan
+
+    xs = origin[0] + (np.arange(shape[0]) + 0.5) * resolution
+    ys = origin[1] + (np.arange(shape[1]) + 0.5) * resolution
+    return xs, ys, raster
+
+
+def _load_or_create_sweep(
+    db: Database,
+    formation: str,
+    stride: int,
+    cells_count: int,
+    simulation_parameters: Dict[str, any]
+) -> Dict[str, any]:
+    sweep_key = get_sweep_key(formation, stride, simulation_parameters)
+    cells = get_sweep_cells(cells_count, stride)
+
+    db.sweeps.update_one(
+        {'_id': sweep_key},
+        {'$setOnInsert': {
+            'formation_id': FORMATIONS.index(formation),
+            'stride': stride,
+            'simulation_parameters': simulation_parameters,
+            'cells': cells,
+            'rewards': [None] * len(cells),
+            'failed': [],
+            'complete': False,
+            'started': time.time()
+        }},
+        upsert=True
+    )
+    return db.sweeps.find_one({'_id': sweep_key})
+
+
+def _checkpoint(
+    db: Database,
+    sweep: Dict[str, any],
+    chunk: List[int],
+    rewards: np.array
+) -> None:
+    for idx, reward in zip(chunk, rewards):
+        sweep['rewards'][idx] = int(reward)
+    db.sweeps.update_one(
+        {'_id': sweep['_id']},
+        {
+            '$set': {
+                **{f'rewards.{idx}': int(reward) for idx, reward in zip(chunk, rewards)},
+                'updated': time.time()
+            },
+            '$pull': {'failed': {'$in': chunk}}
+        }
+    )
+    sweep['failed'] = [idx for idx in sweep.get('failed', []) if idx not in chunk]
+
+
+def _record_failure(
+    db: Database,
+    sweep: Dict[str, any],
+    chunk: List[int]
+) -> None:
+    sweep['failed'] = sorted(set(sweep.get('failed', [])) | set(chunk))
+    db.sweeps.update_one(
+        {'_id': sweep['_id']},
+        {
+            '$addToSet': {'failed': {'$each': chunk}},
+            '$set': {'updated': time.time()}
+        }
+    )
+
+
+if __name__ == '__main__':
+    run_sweep(
+        MongoDBClient('co2sim'),
+        sys.argv[1] if len(sys.argv) > 1 else 'Utsirafm',
+        stride=int(sys.argv[2]) if len(sys.argv) > 2 else 1
+    )
@@ -0,0 +1,38 @@
+import unittest
+from sweep import get_best_cells, get_closest_swept, get_reward_raster, get_sweep_cells
+import numpy as np
+
+CENTROIDS = np.array([
+    [1000, 1000], [3000, 1000], [1000, 3000], [3000, 3000], [1500, 1500]
+], dtype=float)
+
+
+class TestSweep(unittest.TestCase):
+    def test_strided_cells(self) -> None:
+        self.assertEqual(get_sweep_cells(7, stride=3), [0, 3, 6])
+
+    def test_reward_raster_keeps_best_reward_per_pixel(self) -> None:
+        sweep = {'cells': [0, 1, 3, 4], 'rewards': [5, -2, None, 9]}
+
+        xs, ys, raster = get_reward_raster(CENTROIDS, sweep, resolution=2000)
+
+        np.testing.assert_array_equal(xs, [2000, 4000])
+        np.testing.assert_array_equal(ys, [2000, 4000])
+        np.testing.assert_array_equal(raster, [[9, -2], [np.nan, np.nan]])
+
+    def test_best_cells_skip_pending(self) -> None:
+        sweep = {'cells': [0, 2, 4], 'rewards': [3, None, 7]}
+        self.assertEqual(get_best_cells(sweep, count=3), [(4, 7.0), (0, 3.0)])
+
+    def test_closest_swept_cell_answers_nearby_queries(self) -> None:
+        sweep = {'cells': [0, 3, 4], 'rewards': [5, None, 9]}
+
+        self.assertEqual(get_closest_swept(CENTROIDS, sweep, (1100, 1000), max_distance=1000), 0)
+        self.assertEqual(get_closest_swept(CENTROIDS, sweep, (1600, 1600), max_distance=1000), 2)
+        # Pending and far-away cells fall through to a simulation
+        self.assertIsNone(get_closest_swept(CENTROIDS, sweep, (3000, 3000), max_distance=1000))
+        self.assertIsNone(get_closest_swept(CENTROIDS, sweep, (1000, 2600), max_distance=1000))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,88 @@
+import os
+import sys
+import tempfile
+from typing import List, Optional
+
+import numpy as np
+
+from python.db_client.formations import FORMATIONS
+from python.db_client.mongo_client import DEFAULT_COARSENING, MongoDBClient
+from python.web.simulation.engine_pool import create_engine
+
+# Shared with get_trap_analysis.m, which keeps its trapAnalysis results next to these files
+CACHE_DIR = os.environ.get('CO2SIM_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'co2sim'))
+TRAP_CACHE_DIR = os.path.join(CACHE_DIR, 'traps')
+
+
+def get_trap_boundaries_path(
+    formation: str,
+    coarsening: int = DEFAULT_COARSENING
+) -> str:
+    return os.path.join(TRAP_CACHE_DIR, f'trap_boundaries_{formation.lower()}_{coarsening}.npy')
+
+
+def load_trap_boundaries(
+    formation: str,
+    coarsening: int = DEFAULT_COARSENING
+) -> Optional[np.array]:
+    path = get_trap_boundaries_path(formation, coarsening)
+    if not os.path.exists(path):
+        return None
+    return np.load(path)
+
+
+def get_trap_cells_path(
+    formation: str,
+    coarsening: int = DEFAULT_COARSENING
+) -> str:
+    return os.path.join(TRAP_CACHE_DIR, f'trap_cells_{formation.lower()}_{coarsening}.npy')
+
+
+def load_trap_cells(
+    formation: str,
+    coarsening: int = DEFAULT_COARSENING
+) -> Optional[np.array]:
+    path = get_trap_cells_path(formation, coarsening)
+    if not os.path.exists(path):
+        return None
+    return np.load(path)
+
+
+def get_trap_boundary_vertices(
+    mongo_client: MongoDBClient,
+    formation: str,
+    coarsening: int = DEFAULT_COARSENING
+) -> np.array:
+    edges = load_trap_boundaries(formation, coarsening)
+    if edges is None:
+        return mongo_client.get_vertices(formation, 'faces_trapping', coarsening)
+
+    return mongo_client.geometry_cache.get_or_load(
+        (formation, 'trap_boundaries', coarsening),
+        lambda: mongo_client.get_nodes(formation, coarsening)[edges - 1]
+    )
+
+
+def warm_trap_cache(
+    formations: List[str],
+    coarsening: int = DEFAULT_COARSENING,
+    eng=None
+) -> None:
+    eng = eng or create_engine()
+    os.makedirs(TRAP_CACHE_DIR, exist_ok=True)
+
+    for formation in formations:
+        try:
+            edges = eng.get_trap_boundaries(formation, coarsening)
+            traps = eng.get_trap_cells(formation, coarsening)
+        except Exception as e:
+            print(f"Couldn't analyse traps of {formation}: {e}")
+            continue
+
+        np.save(get_trap_boundaries_path(formation, coarsening), np.asarray(edges, dtype=np.int32).reshape(-1, 2))
+        np.save(get_trap_cells_path(formation, coarsening), np.asarray(traps, dtype=np.int32).flatten())
+        print(f'Traps of {formation} are cached')
+
+
+if __name__ == '__main__':
+    warm_trap_cache(sys.argv[1:] or FORMATIONS)